@@ -1,11 +1,2 @@
-from flask import Flask
 from .config import Config
-
-def create_app():
-    app = Flask(__name__)
-    app.config.from_object(Config)
-
-    from .routes.api_routes import register_routes
-    register_routes(app)
-
-    return app 
\ No newline at end of file
+from .factory import create_app
\ No newline at end of file
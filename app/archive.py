@@ -0,0 +1,382 @@
+import bisect
+import os
+import shutil
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.health_utils import SensorWindow
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: appends are only serialized within the process
+    fcntl = None
+
+TIMESTAMP_FILE = "timestamp.f8"
+INDEX_FILE = "index.f8"
+# Random ID written when an asset's history is created
+GENERATION_FILE = "generation"
+# Sample timestamps must fall in years 1-9999 (what datetime can represent), in epoch seconds
+MIN_TIMESTAMP = -62135596800.0
+MAX_TIMESTAMP = 253402300800.0
+# Samples per index block; a short last block is extended by the next append
+BLOCK_ROWS = 4096
+# Leading fields of an index record, followed by per-sensor minima then maxima
+START, STOP, T_MIN, T_MAX, SORTED = range(5)
+# Index header: layout version, record width, checksum of the sensor keys,
+# and whether the blocks follow each other in time; the records come after it
+INDEX_VERSION = 1
+IN_ORDER = 3
+HEADER_FIELDS = 4
+
+
+class SampleArchive:
+    """Append-only per-asset sample history on local disk.
+
+    Each asset is a directory holding one little-endian float64 file per
+    sensor plus ``timestamp.f8``; row ``i`` of every file is one sample.
+    Windows are sorted by time and appended under a per-asset file lock,
+    with the timestamp file written last: its length is the committed
+    sample count, and a torn append is cut back to it on the next write.
+    Reads map the files with ``numpy.memmap``, so only the pages holding
+    the requested rows are read.
+
+    ``index.f8`` is a sparse index with one record per block of up to
+    BLOCK_ROWS samples: its row range, first/last timestamp, whether it is
+    time-sorted, and the min/max of every sensor. Appends fill the last
+    block before starting a new one, so small appends do not grow the index
+    by a record each. Time ranges are found by binary search over the
+    blocks and then within the boundary blocks, and violation scans skip
+    blocks whose min/max lie inside the bands. The index is memory-mapped,
+    and while blocks were appended in time order (a flag kept in its
+    header) a time range is found by binary search without reading the
+    rest of it. The header also holds the record width and a checksum of
+    the sensor keys; an index written for another schema is rebuilt from
+    the sample files.
+    """
+
+    def __init__(self, root: str, keys):
+        self.root = root
+        self.keys = tuple(keys)
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, asset_id: str) -> str:
+        # Hex-encoded so any asset ID is a safe directory name
+        return os.path.join(self.root, str(asset_id).encode().hex())
+
+    def assets(self) -> list:
+        return sorted(bytes.fromhex(name).decode() for name in os.listdir(self.root)
+                      if os.path.isdir(os.path.join(self.root, name)))
+
+    @contextmanager
+    def _locked(self, directory: str):
+        with self.lock:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, ".lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def _files(self, directory: str) -> list:
+        return [os.path.join(directory, f"{key}.f8") for key in self.keys]
+
+    def _header(self, in_order: bool) -> np.ndarray:
+        return np.array([INDEX_VERSION, 5 + 2 * len(self.keys), zlib.crc32("\0".join(self.keys).encode()),
+                         in_order], dtype="<f8")
+
+    def samples(self, asset_id: str) -> int:
+        return _committed(self.path(asset_id))
+
+    def generation(self, asset_id: str) -> str:
+        """ID of the asset's current history; a dropped and re-created asset gets a new one."""
+        try:
+            with open(os.path.join(self.path(asset_id), GENERATION_FILE)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def append(self, asset_id: str, window: SensorWindow) -> int:
+        """Store a window (arrival time for untimestamped samples); returns the new total.
+
+        Raises ValueError for a timestamp outside MIN_TIMESTAMP..MAX_TIMESTAMP.
+        """
+        timestamps = window.timestamps
+        if timestamps is None:
+            timestamps = np.full(len(window), time.time())
+        timestamps = np.where(np.isnan(timestamps), time.time(), timestamps)
+        if not ((timestamps >= MIN_TIMESTAMP) & (timestamps < MAX_TIMESTAMP)).all():
+            raise ValueError("Timestamps must be epoch seconds within years 1-9999")
+        order = np.argsort(timestamps, kind="stable")
+        matrix = window.select(self.keys, required=False)
+        directory = self.path(asset_id)
+        with self._locked(directory):
+            committed = _committed(directory)
+            if not os.path.exists(os.path.join(directory, GENERATION_FILE)):
+                with open(os.path.join(directory, GENERATION_FILE), "w") as f:
+                    f.write(os.urandom(8).hex())
+            records, in_order = self._index(directory, committed)
+            matrix, timestamps = matrix[order], timestamps[order]
+            for path, column in zip(self._files(directory), matrix.T):
+                _append_column(path, committed, column)
+            first = len(records)
+            tail = int(records[-1, STOP] - records[-1, START]) if first else BLOCK_ROWS
+            added = _block_records(matrix, timestamps, committed, head=BLOCK_ROWS - tail)
+            if tail < BLOCK_ROWS and len(added):
+                first -= 1
+                added[0] = _merge_records(records[-1], added[0])
+            in_order = (in_order or first == 0) and _in_order(np.concatenate([records[first - 1:first], added]))
+            self._write_index(directory, first, added, in_order)
+            _append_column(os.path.join(directory, TIMESTAMP_FILE), committed, timestamps)
+            return committed + len(order)
+
+    def _load_index(self, directory: str, count: int):
+        # (records, in_order): the memory-mapped index records of the blocks
+        # starting within the first `count` samples, found by binary search.
+        # The last one may run past `count` while an append is extending it,
+        # and they may cover fewer samples than `count`. Empty when the index
+        # is missing or was written for another schema.
+        path = os.path.join(directory, INDEX_FILE)
+        width = 5 + 2 * len(self.keys)
+        size = (os.path.getsize(path) // 8 - HEADER_FIELDS) // width if os.path.exists(path) else 0
+        if size <= 0:
+            return np.empty((0, width)), False
+        index = np.memmap(path, dtype="<f8", mode="r", shape=(HEADER_FIELDS + size * width,))
+        if not np.array_equal(index[:IN_ORDER], self._header(False)[:IN_ORDER]):
+            return np.empty((0, width)), False
+        records = index[HEADER_FIELDS:].reshape(size, width)
+        return records[:bisect.bisect_left(records[:, START], count)], bool(index[IN_ORDER])
+
+    def _index(self, directory: str, count: int):
+        # Like _load_index, but under the lock: records of a torn append are
+        # dropped and missing ones (archives written before the index
+        # existed, or for another schema) are rebuilt, so the result covers
+        # exactly `count` samples.
+        path = os.path.join(directory, INDEX_FILE)
+        records, in_order = self._load_index(directory, count)
+        records = records[:bisect.bisect_right(records[:, STOP], count)]
+        done = int(records[-1, STOP]) if len(records) else 0
+        if done == count and os.path.exists(path) and \
+                os.path.getsize(path) == 8 * HEADER_FIELDS + records.nbytes:
+            return records, in_order
+        missing = np.empty((0, records.shape[1]))
+        if done < count:
+            timestamps = _map_column(os.path.join(directory, TIMESTAMP_FILE), count)[done:]
+            matrix = np.column_stack([_map_column(f, count)[done:] for f in self._files(directory)])
+            missing = _block_records(matrix, timestamps, done, presorted=False)
+        records = np.concatenate([records, missing])
+        # Rewritten whole: the index is never shrunk in place under a reader's map
+        self._write_index(directory, 0, records, _in_order(records))
+        return records, _in_order(records)
+
+    def _write_index(self, directory: str, first: int, records: np.ndarray, in_order: bool):
+        # Replace the index records from `first` on. A new index is written
+        # beside the old one and swapped in, so readers never see it
+        # half-written; otherwise the order flag is cleared before records
+        # that break the order are written.
+        path = os.path.join(directory, INDEX_FILE)
+        data = np.ascontiguousarray(records, dtype="<f8").tobytes()
+        if first == 0:
+            partial = f"{path}.{os.getpid()}.tmp"
+            with open(partial, "wb") as f:
+                f.write(self._header(in_order).tobytes() + data)
+            os.replace(partial, path)
+            return
+        with open(path, "r+b") as f:
+            if not in_order:
+                f.seek(8 * IN_ORDER)
+                f.write(np.zeros(1, dtype="<f8").tobytes())
+            f.seek(8 * (HEADER_FIELDS + first * records.shape[1]))
+            f.write(data)
+
+    def blocks(self, asset_id: str, start: float = None, end: float = None) -> np.ndarray:
+        """Index records of the blocks that may hold samples in ``[start, end)``."""
+        return self._blocks(self.path(asset_id), self.samples(asset_id), start, end)
+
+    def _blocks(self, directory: str, count: int, start: float = None, end: float = None) -> np.ndarray:
+        # Blocks of the first `count` samples only, so they match columns
+        # mapped with that count even if another append lands meanwhile
+        if count == 0:
+            return np.empty((0, 5 + 2 * len(self.keys)))
+        records, in_order = self._load_index(directory, count)
+        if not len(records) or records[-1, STOP] < count:
+            with self._locked(directory):
+                # Indexed up to the current count, which later appends may have raised
+                records, in_order = self._index(directory, _committed(directory))
+            records = records[:bisect.bisect_left(records[:, START], count)]
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+        if in_order:
+            # Binary search for the first and last block, touching only the
+            # index pages it probes
+            blocks = np.array(records[bisect.bisect_left(records[:, T_MAX], start):
+                                      bisect.bisect_left(records[:, T_MIN], end)])
+        else:
+            blocks = np.array(records[(records[:, T_MAX] >= start) & (records[:, T_MIN] < end)])
+        # An append in progress may have extended the last block past `count`;
+        # its bounds still hold for the committed rows
+        blocks[:, STOP] = np.minimum(blocks[:, STOP], count)
+        return blocks
+
+    def _rows(self, timestamps: np.ndarray, blocks: np.ndarray, start: float, end: float) -> np.ndarray:
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+        rows = []
+        for block in blocks:
+            lo, hi = int(block[START]), int(block[STOP])
+            if start <= block[T_MIN] and block[T_MAX] < end:
+                rows.append(np.arange(lo, hi))
+            elif block[SORTED]:
+                times = timestamps[lo:hi]
+                rows.append(np.arange(lo + np.searchsorted(times, start, "left"),
+                                      lo + np.searchsorted(times, end, "left")))
+            else:
+                times = timestamps[lo:hi]
+                rows.append(lo + np.flatnonzero((times >= start) & (times < end)))
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.intp)
+
+    def read(self, asset_id: str, start: float = None, end: float = None):
+        """Samples with ``start <= timestamp < end`` as a SensorWindow, or None for an unknown asset."""
+        count = self.samples(asset_id)
+        if count == 0:
+            return None
+        directory = self.path(asset_id)
+        timestamps = _map_column(os.path.join(directory, TIMESTAMP_FILE), count)
+        rows = self._rows(timestamps, self._blocks(directory, count, start, end), start, end)
+        values = np.empty((rows.size, len(self.keys)), order="F")
+        for i, path in enumerate(self._files(directory)):
+            values[:, i] = _map_column(path, count)[rows]
+        return SensorWindow(values, self.keys, np.asarray(timestamps[rows]))
+
+    def rows(self, asset_id: str, first: int = 0, stop: int = None) -> SensorWindow:
+        """Rows ``first:stop`` in append order (not time order) as a SensorWindow."""
+        count = self.samples(asset_id)
+        stop = count if stop is None else min(stop, count)
+        first = min(first, stop)
+        directory = self.path(asset_id)
+        values = np.empty((stop - first, len(self.keys)), order="F")
+        for i, path in enumerate(self._files(directory)):
+            values[:, i] = _map_column(path, count)[first:stop]
+        timestamps = np.array(_map_column(os.path.join(directory, TIMESTAMP_FILE), count)[first:stop])
+        return SensorWindow(values, self.keys, timestamps)
+
+    def violations(self, asset_id: str, low: np.ndarray, high: np.ndarray,
+                   start: float = None, end: float = None, limit: int = 1000):
+        """Samples outside ``[low, high]`` per sensor, or None for an unknown asset.
+
+        Returns per-sensor counts, up to ``limit`` (timestamp, sensor, value)
+        entries in time order, and how many blocks were scanned or skipped.
+        """
+        count = self.samples(asset_id)
+        if count == 0:
+            return None
+        directory = self.path(asset_id)
+        n = len(self.keys)
+        blocks = self._blocks(directory, count, start, end)
+        mins, maxs = blocks[:, 5:5 + n], blocks[:, 5 + n:]
+        in_band = ((low <= mins) & (maxs <= high)).all(axis=1)
+        scanned = blocks[~in_band]
+        timestamps = _map_column(os.path.join(directory, TIMESTAMP_FILE), count)
+        rows = self._rows(timestamps, scanned, start, end)
+        counts = np.zeros(n, dtype=np.int64)
+        found = []
+        for i, path in enumerate(self._files(directory) if rows.size else []):
+            values = _map_column(path, count)[rows]
+            out = np.flatnonzero((values < low[i]) | (values > high[i]))
+            counts[i] = out.size
+            found.append((timestamps[rows[out]], np.full(out.size, i), values[out]))
+        samples = []
+        if found:
+            times, sensors, values = (np.concatenate(parts) for parts in zip(*found))
+            first = np.lexsort((sensors, times))[:limit]
+            samples = [{"timestamp": t, "sensor": self.keys[s], "value": v}
+                       for t, s, v in zip(times[first].tolist(), sensors[first].tolist(), values[first].tolist())]
+        return {
+            "counts": dict(zip(self.keys, counts.tolist())),
+            "samples": samples,
+            "blocks_scanned": int(scanned.shape[0]),
+            "blocks_skipped": int(in_band.sum())
+        }
+
+    def drop(self, asset_id: str) -> bool:
+        directory = self.path(asset_id)
+        with self.lock:
+            if not os.path.isdir(directory):
+                return False
+            shutil.rmtree(directory)
+            return True
+
+
+def _committed(directory: str) -> int:
+    # Committed sample count: the length of the timestamp file, written last
+    path = os.path.join(directory, TIMESTAMP_FILE)
+    return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+
+def _append_column(path: str, committed: int, values: np.ndarray):
+    # Cut a torn append back to the committed length, or NaN-fill a column
+    # that is behind it (e.g. a sensor added to the schema later), then append.
+    with open(path, "ab") as f:
+        size = f.tell() // 8
+        if size > committed:
+            f.truncate(committed * 8)
+        elif size < committed:
+            f.write(np.full(committed - size, np.nan, dtype="<f8").tobytes())
+        f.write(values.astype("<f8").tobytes())
+
+
+def _map_column(path: str, count: int) -> np.ndarray:
+    size = min(os.path.getsize(path) // 8, count) if os.path.exists(path) else 0
+    if size == count:
+        return np.memmap(path, dtype="<f8", mode="r", shape=(count,))
+    column = np.full(count, np.nan)
+    if size:
+        column[:size] = np.memmap(path, dtype="<f8", mode="r", shape=(size,))
+    return column
+
+
+def _block_records(matrix: np.ndarray, timestamps: np.ndarray, offset: int,
+                   presorted: bool = True, head: int = 0) -> np.ndarray:
+    # One index record per BLOCK_ROWS samples of a window starting at row
+    # `offset`, after a first block of `head` samples (if positive)
+    if len(timestamps) == 0:
+        return np.empty((0, 5 + 2 * matrix.shape[1]))
+    starts = np.unique(np.r_[0, np.arange(max(head, 0), len(timestamps), BLOCK_ROWS)])
+    stops = np.append(starts[1:], len(timestamps))
+    with np.errstate(invalid="ignore"):
+        # All-NaN blocks get +inf/-inf, which every band contains
+        mins = np.fmin.reduceat(np.where(np.isnan(matrix), np.inf, matrix), starts, axis=0)
+        maxs = np.fmax.reduceat(np.where(np.isnan(matrix), -np.inf, matrix), starts, axis=0)
+    if presorted:
+        ordered = np.ones(starts.size)
+    else:
+        # A block is sorted unless a step inside it goes back in time
+        back = np.append(np.diff(timestamps) < 0, False)
+        back[stops - 1] = False
+        ordered = 1.0 - np.logical_or.reduceat(back, starts)
+    return np.column_stack([
+        starts + offset, stops + offset,
+        np.minimum.reduceat(timestamps, starts), np.maximum.reduceat(timestamps, starts),
+        ordered, mins, maxs
+    ])
+
+
+def _in_order(records: np.ndarray) -> bool:
+    # Whether each block starts and ends no earlier than the one before it
+    return bool((np.diff(records[:, T_MIN]) >= 0).all() and (np.diff(records[:, T_MAX]) >= 0).all())
+
+
+def _merge_records(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    # The record of a block made of two consecutive ones
+    n = (len(first) - 5) // 2
+    merged = np.empty_like(first)
+    merged[START], merged[STOP] = first[START], second[STOP]
+    merged[T_MIN] = min(first[T_MIN], second[T_MIN])
+    merged[T_MAX] = max(first[T_MAX], second[T_MAX])
+    merged[SORTED] = float(first[SORTED] and second[SORTED] and first[T_MAX] <= second[T_MIN])
+    merged[5:5 + n] = np.minimum(first[5:5 + n], second[5:5 + n])
+    merged[5 + n:] = np.maximum(first[5 + n:], second[5 + n:])
+    return merged
@@ -0,0 +1,196 @@
+import asyncio
+import contextvars
+import io
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsgiAdapter:
+    """Serve the Flask app over ASGI without giving up a thread per connection.
+
+    Request bodies are received on the event loop, so slow uploads only cost a
+    coroutine. Once a body is complete the Flask view (and its NumPy work)
+    runs on a bounded thread pool, and at most ``max_pending`` requests are
+    queued for it; further requests wait on the loop instead of piling up
+    threads. Response chunks are pulled from the WSGI iterator one at a time,
+    so streamed responses stay streamed; every step of one response runs in
+    the same ``contextvars.Context``, which Flask's request context (and
+    ``stream_with_context``) relies on even when steps land on different
+    pool threads. Bodies above ``max_body`` bytes get a 413, and a client
+    that disconnects mid-upload never reaches the view. Buffered bodies
+    count against ``max_buffered`` bytes across all requests until their
+    response is sent, so uploads beyond it get a 503 instead of growing
+    memory without bound while they wait for a slot.
+    """
+
+    def __init__(self, wsgi_app, max_workers: int = 8, max_pending: int = 256,
+                 max_body: int = 64 * 1024 * 1024, max_buffered: int = 256 * 1024 * 1024):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asgi-worker")
+        self.max_pending = max_pending
+        self.max_body = max_body
+        self.max_buffered = max_buffered
+        self._buffered = 0
+        self._slots = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        try:
+            body = await self.read_body(scope, receive)
+        except BodyTooLarge:
+            await self.send_error(send, 413, "Request body too large")
+            return
+        except ServerBusy:
+            await self.send_error(send, 503, "Too many request bodies in flight")
+            return
+        if body is None:
+            return  # the client went away before the body was complete
+        try:
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.max_pending)
+            async with self._slots:
+                await self.run_wsgi(scope, body, send)
+        finally:
+            self._buffered -= len(body)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def read_body(self, scope, receive):
+        # The complete body, or None when the client disconnects first. Its
+        # bytes stay counted in _buffered until the caller releases them
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit():
+                if int(value) > self.max_body:
+                    raise BodyTooLarge()
+                if int(value) > self.max_buffered - self._buffered:
+                    raise ServerBusy()
+        chunks = []
+        size = 0
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    self._buffered -= size
+                    return None
+                chunk = message.get("body", b"")
+                if size + len(chunk) > self.max_body:
+                    raise BodyTooLarge()
+                if self._buffered + len(chunk) > self.max_buffered:
+                    raise ServerBusy()
+                size += len(chunk)
+                self._buffered += len(chunk)
+                chunks.append(chunk)
+                if not message.get("more_body"):
+                    return b"".join(chunks)
+        except BaseException:
+            self._buffered -= size
+            raise
+
+    async def send_error(self, send, status: int, message: str):
+        body = json.dumps({"error": message}).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+
+    async def run_wsgi(self, scope, body: bytes, send):
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers]
+
+        environ = build_environ(scope, body)
+        context = contextvars.copy_context()
+
+        def step(fn, *args):
+            return loop.run_in_executor(self.executor, context.run, fn, *args)
+
+        result = await step(self.wsgi_app, environ, start_response)
+        iterator = iter(result)
+        try:
+            sent_start = False
+            while True:
+                chunk = await step(next, iterator, None)
+                if not sent_start:
+                    await send({"type": "http.response.start",
+                                "status": started["status"], "headers": started["headers"]})
+                    sent_start = True
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                await step(close)
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class ServerBusy(Exception):
+    pass
+
+
+def build_environ(scope, body: bytes) -> dict:
+    script_name = scope.get("root_path", "").encode("utf8").decode("latin1")
+    path_info = scope["path"].encode("utf8").decode("latin1")
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": script_name,
+        "PATH_INFO": path_info,
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1")
+        if name == "content-length":
+            continue
+        key = "CONTENT_TYPE" if name == "content-type" else "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def create_asgi_app(wsgi_app=None):
+    if wsgi_app is None:
+        from .factory import create_app
+        wsgi_app = create_app()
+    return AsgiAdapter(wsgi_app,
+                       max_workers=wsgi_app.config["ASGI_WORKER_THREADS"],
+                       max_pending=wsgi_app.config["ASGI_MAX_PENDING"],
+                       max_body=wsgi_app.config["ASGI_MAX_BODY"],
+                       max_buffered=wsgi_app.config["ASGI_MAX_BUFFERED"])
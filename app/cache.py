@@ -0,0 +1,88 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """LRU cache of finished responses with a per-entry time to live.
+
+    Keys are a BLAKE2 digest of the endpoint, query string, content type and
+    raw request body, so a repeated payload is answered before any JSON
+    parsing or NumPy work happens. Besides the entry count, the summed
+    ``size`` of the stored values is kept under ``max_bytes``.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_body: int, max_bytes: int = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_body = max_body
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    @staticmethod
+    def key(endpoint: str, query: bytes, content_type: str, body: bytes) -> bytes:
+        digest = hashlib.blake2b(digest_size=20)
+        for part in (endpoint.encode(), query, (content_type or "").encode()):
+            digest.update(part)
+            digest.update(b"\0")
+        digest.update(body)
+        return digest.digest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < now:
+                self._remove(key)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, size: int = 0):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or (
+                    self.max_bytes is not None and self.bytes > self.max_bytes):
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        self.bytes -= self.entries.pop(key)[2]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
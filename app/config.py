@@ -1,4 +1,58 @@
 class Config:
     DEBUG = False
     TESTING = False
-    # Add other configuration variables as needed 
\ No newline at end of file
+    # Upper bound on jobs accepted by the /report/batch and /analyze/batch endpoints
+    MAX_BATCH_JOBS = 1000
+    # Rolling window kept per asset by /report/stream, and how many assets to track
+    STREAM_WINDOW = 1000
+    STREAM_MAX_ASSETS = 10000
+    # Threshold profiles kept by the /profiles registry before the least recently used is dropped
+    MAX_THRESHOLD_PROFILES = 1024
+    # asgi.py: threads running Flask views, and requests allowed to wait for one
+    ASGI_WORKER_THREADS = 8
+    ASGI_MAX_PENDING = 256
+    # asgi.py buffers each request body before running the view; larger bodies get a 413
+    ASGI_MAX_BODY = 64 * 1024 * 1024
+    # Bytes of request bodies buffered across all requests at once; uploads beyond it get a 503
+    ASGI_MAX_BUFFERED = 256 * 1024 * 1024
+    # Windows with at least this many samples are analyzed on a process pool (0 disables).
+    # Off by default: each server worker would start its own pool of OFFLOAD_WORKERS processes
+    OFFLOAD_MIN_SAMPLES = 0
+    OFFLOAD_WORKERS = None  # defaults to os.cpu_count()
+    # Responses to identical request bodies are reused for this long (0 entries disables).
+    # Request and response bodies above MAX_BODY bytes are never cached, and the stored
+    # responses of one worker are kept under MAX_BYTES in total
+    RESPONSE_CACHE_SIZE = 1024
+    RESPONSE_CACHE_TTL = 30
+    RESPONSE_CACHE_MAX_BODY = 1024 * 1024
+    RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    # Prometheus counters and per-stage histograms served at /metrics
+    METRICS_ENABLED = True
+    # Most time buckets one /report/trend response may hold
+    MAX_TREND_BUCKETS = 10000
+    # "float32" halves memory traffic of the robust statistics; requests may
+    # override it with a "precision" field or query parameter
+    COMPUTE_PRECISION = "float64"
+    # Estimate median/MAD from a uniform sample of huge windows: always, or per
+    # request with "approximate": true. The sample is sized (Dvoretzky-Kiefer-
+    # Wolfowitz) so quantile ranks are off by at most RANK_ERROR with the given
+    # confidence; smaller windows stay exact
+    APPROXIMATE = False
+    APPROXIMATE_RANK_ERROR = 0.01
+    APPROXIMATE_CONFIDENCE = 0.99
+    # Directory of the per-asset sample archive (/archive endpoints); None disables it
+    ARCHIVE_DIR = None
+    # Newest minute/hour/day rollup buckets kept per archived asset for /archive/<asset_id>/summary
+    ROLLUP_RETENTION = {"minute": 1440, "hour": 720, "day": 365}
+    # Serve the Swagger UI at /apidocs/; when False only /apispec.json is served and
+    # flasgger is never imported (faster worker start-up, e.g. in production)
+    SWAGGER_UI = True
+    # JSON copy of swagger.yaml that new processes load instead while it is newer than the YAML
+    SWAGGER_SPEC_CACHE = None
+    # cProfile individual requests: always, or only those sending "X-Profile: 1"
+    PROFILING_ENABLED = False
+    PROFILING_ALLOW_HEADER = False
+    PROFILE_TOP_N = 15
+    PROFILE_DIR = None  # also keep .prof files here when set
+    PROFILE_KEEP = 50
+    # Add other configuration variables as needed
\ No newline at end of file
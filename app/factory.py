@@ -1,35 +1,26 @@
 from flask import Flask
-from flasgger import Swagger
-import os
+from .config import Config
+from .health_utils import configure_offload
 from .routes.api_routes import register_routes
+from .json_provider import FastJSONProvider
+from .spec import register_swagger
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
+    app.config.from_object(Config)
+    if test_config is not None:
+        app.config.update(test_config)
+    app.json = FastJSONProvider(app)
+    configure_offload(app.config["OFFLOAD_MIN_SAMPLES"], app.config["OFFLOAD_WORKERS"])
 
-    swagger_config = {
-        "headers": [],
-        "specs": [
-            {
-                "endpoint": 'apispec',
-                "route": '/apispec.json',
-                "rule_filter": lambda rule: True,
-                "model_filter": lambda tag: True,
-            }
-        ],
-        "static_url_path": "/flasgger_static",
-        "swagger_ui": True,
-        "specs_route": "/apidocs/",
-        "title": "Asset Health Prediction API",
-        "description": "API for predicting asset health using various sensors",
-        "termsOfService": "",
-        "uiversion": 2
-    }
-
-    base_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-    swagger_file = os.path.join(base_dir, 'swagger', 'swagger.yaml')
-    Swagger(app, 
-           template_file=swagger_file,
-           config=swagger_config)
+    register_swagger(app)
 
+    # prometheus_client and cProfile are only imported when their hooks are enabled
+    if app.config["METRICS_ENABLED"]:
+        from .metrics import register_metrics
+        register_metrics(app)
+    if app.config["PROFILING_ENABLED"] or app.config["PROFILING_ALLOW_HEADER"]:
+        from .profiling import register_profiling
+        register_profiling(app)
     register_routes(app)
     return app
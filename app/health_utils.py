@@ -1,39 +1,430 @@
+import os
+import threading
+
 import numpy as np
 
+from app.timing import stage
+
+def is_columnar(data_list) -> bool:
+    return isinstance(data_list, dict)
+
+def extract_column(data_list, log_key: str, required: bool = True) -> np.ndarray:
+    # data_list is a list of row dicts, a dict of sensor columns
+    # ({"temperature_one": [...], ...}) or a SensorWindow; columns convert in a
+    # single call and window columns are returned as views.
+    if isinstance(data_list, SensorWindow):
+        if log_key in data_list.index:
+            return data_list.column(log_key)
+        if required:
+            raise KeyError(log_key)
+        return np.empty(0, dtype=data_list.values.dtype)
+    if is_columnar(data_list):
+        if log_key not in data_list:
+            if required:
+                raise KeyError(log_key)
+            return np.empty(0, dtype=float)
+        return np.asarray(data_list[log_key], dtype=float).reshape(-1)
+    if required:
+        return np.fromiter((row[log_key] for row in data_list), dtype=float, count=len(data_list))
+    return np.fromiter((row.get(log_key, np.nan) for row in data_list), dtype=float, count=len(data_list))
+
+def sensor_matrix(data_list, keys, required: bool = True, dtype=None) -> np.ndarray:
+    # (samples x sensors) in Fortran order so every sensor column is contiguous;
+    # shorter columns and missing readings are padded with NaN. dtype defaults
+    # to float64, or to the window's own dtype for a SensorWindow.
+    if isinstance(data_list, SensorWindow):
+        matrix = data_list.select(keys, required)
+        return matrix if dtype is None else matrix.astype(dtype, order="F", copy=False)
+    columns = [extract_column(data_list, key, required) for key in keys]
+    n_samples = max((col.size for col in columns), default=0)
+    matrix = np.full((n_samples, len(columns)), np.nan, dtype=dtype or float, order="F")
+    for i, col in enumerate(columns):
+        matrix[:col.size, i] = col
+    return matrix
+
+class SensorWindow:
+    """One window of readings held as a single (samples x sensors) array.
+
+    ``values`` is float32 or float64 in Fortran order, so each sensor column
+    is a contiguous view; ``index`` maps data keys to column positions and
+    ``timestamps`` optionally holds one epoch time per sample. Analyzers
+    take a window in place of ``data_list`` and slice the columns they need
+    out of ``values``; a window laid out like their schema is not copied.
+    """
+    __slots__ = ("values", "columns", "index", "timestamps")
+
+    def __init__(self, values, columns, timestamps=None):
+        values = np.asarray(values)
+        if values.dtype not in (np.float32, np.float64):
+            values = values.astype(float)
+        if values.ndim != 2 or values.shape[1] != len(columns):
+            raise ValueError("Expected a (samples x sensors) array with one name per column")
+        self.values = np.asfortranarray(values)
+        self.columns = tuple(columns)
+        self.index = {key: i for i, key in enumerate(self.columns)}
+        if timestamps is not None:
+            timestamps = np.asarray(timestamps, dtype=float).reshape(-1)
+            if timestamps.size != values.shape[0]:
+                raise ValueError("Expected one timestamp per sample")
+        self.timestamps = timestamps
+
+    @classmethod
+    def from_data(cls, data_list, columns=None, required: bool = False, dtype=None,
+                  timestamp_key: str = None):
+        """Build a window from rows or columns, laid out as ``columns`` (all sensors by default)."""
+        if isinstance(data_list, cls):
+            return data_list
+        columns = tuple(columns or QUAD_SCHEMA.keys)
+        timestamps = None
+        if timestamp_key is not None:
+            timestamps = extract_column(data_list, timestamp_key, required=False)
+            timestamps = timestamps if timestamps.size else None
+        return cls(sensor_matrix(data_list, columns, required, dtype), columns, timestamps)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + (0 if self.timestamps is None else self.timestamps.nbytes)
+
+    def column(self, key: str) -> np.ndarray:
+        return self.values[:, self.index[key]]
+
+    def select(self, keys, required: bool = True) -> np.ndarray:
+        # A view when keys are a contiguous run of columns, otherwise a copy
+        # with absent sensors filled with NaN (KeyError when required).
+        keys = tuple(keys)
+        if keys == self.columns:
+            return self.values
+        positions = [self.index.get(key) for key in keys]
+        missing = [key for key, pos in zip(keys, positions) if pos is None]
+        if missing and required:
+            raise KeyError(missing[0])
+        if keys and not missing and positions == list(range(positions[0], positions[0] + len(keys))):
+            return self.values[:, positions[0]:positions[0] + len(keys)]
+        matrix = np.full((len(self), len(keys)), np.nan, dtype=self.values.dtype, order="F")
+        for i, pos in enumerate(positions):
+            if pos is not None:
+                matrix[:, i] = self.values[:, pos]
+        return matrix
+
+def nan_median(matrix: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # Column-wise median via np.partition; NaNs are moved past the valid values
+    # so each column's middle elements sit at (count - 1) // 2 and count // 2.
+    if matrix.shape[0] == 0:
+        return np.full(matrix.shape[1], np.nan)
+    filled = np.where(np.isnan(matrix), np.inf, matrix) if (counts < matrix.shape[0]).any() else matrix
+    lo = np.maximum((counts - 1) // 2, 0)
+    hi = np.minimum(counts // 2, matrix.shape[0] - 1)
+    part = np.partition(filled, np.unique(np.concatenate([lo, hi])), axis=0)
+    cols = np.arange(matrix.shape[1])
+    med = (part[lo, cols] + part[hi, cols]) / 2
+    med[counts == 0] = np.nan
+    return med
+
+def robust_means(matrix: np.ndarray, k_outlier: float = 3.5, max_frac: float = 0.05) -> np.ndarray:
+    """Outlier-trimmed mean of every column of a (samples x sensors) matrix.
+
+    For each sensor the median and MAD are taken over the non-NaN samples;
+    samples further than ``k_outlier`` robust sigmas from the median are
+    dropped when they make up at most ``max_frac`` of the column. A column
+    with zero MAD returns its median and an empty column returns NaN.
+
+    A float32 matrix is sorted and summed in float32 (the sums accumulate
+    in float64, and the trim cut is compared in float64); anything else is
+    converted to float64. Results are float64.
+    """
+    matrix = np.asarray(matrix)
+    if matrix.dtype != np.float32:
+        matrix = matrix.astype(float, copy=False)
+    if matrix.ndim == 1:
+        matrix = matrix[:, np.newaxis]
+    min_samples = _offload["min_samples"]
+    if min_samples and matrix.shape[0] >= min_samples and _offload["workers"] > 1:
+        return offloaded_robust_means(matrix, k_outlier, max_frac)
+    return _robust_means(matrix, k_outlier, max_frac)
+
+def _robust_means(matrix: np.ndarray, k_outlier: float, max_frac: float) -> np.ndarray:
+    valid = ~np.isnan(matrix)
+    counts = valid.sum(axis=0)
+    med = nan_median(matrix, counts)
+    dev = np.abs(matrix - med)
+    mad = nan_median(dev, counts)
+    return _trimmed_means(matrix, valid, counts, dev, med, mad, k_outlier, max_frac)
+
+def _trimmed_means(matrix, valid, counts, dev, med, mad, k_outlier, max_frac) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # The cut is formed in float64 even for float32 input, so rounding of
+        # the cut itself never decides whether a reading is trimmed
+        mask_out = dev > np.asarray(mad, dtype=np.float64) * (k_outlier * 1.4826)
+        trim = mask_out.sum(axis=0) / counts <= max_frac
+        keep = valid & ~(mask_out & trim)
+        means = np.where(keep, matrix, 0.0).sum(axis=0, dtype=np.float64) / keep.sum(axis=0)
+    return np.where(mad == 0, med, means).astype(float, copy=False)
+
+# Large windows are split by sensor column across a process pool. The matrix
+# is copied once into shared memory and workers attach to it by name, so no
+# sample data is pickled.
+_offload = {"min_samples": 0, "workers": 1}
+_offload_pool = None
+_offload_lock = threading.Lock()
+
+def configure_offload(min_samples: int, workers: int = None):
+    """Send windows of at least ``min_samples`` samples to a process pool (0 disables)."""
+    global _offload_pool
+    with _offload_lock:
+        if _offload_pool is not None:
+            _offload_pool.shutdown(wait=False)
+            _offload_pool = None
+        _offload["min_samples"] = min_samples or 0
+        _offload["workers"] = workers or os.cpu_count() or 1
+
+def _get_offload_pool():
+    global _offload_pool
+    with _offload_lock:
+        if _offload_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            context = multiprocessing.get_context("spawn")
+            _offload_pool = ProcessPoolExecutor(max_workers=_offload["workers"], mp_context=context)
+        return _offload_pool
+
+def _shared_robust_means(name, shape, dtype, start, stop, k_outlier, max_frac):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=name)
+    matrix = np.ndarray(shape, dtype=dtype, buffer=shm.buf, order="F")
+    result = _robust_means(matrix[:, start:stop], k_outlier, max_frac)
+    del matrix
+    shm.close()
+    return result
+
+def offloaded_robust_means(matrix: np.ndarray, k_outlier: float = 3.5, max_frac: float = 0.05) -> np.ndarray:
+    from multiprocessing import shared_memory  # deferred with the pool: most workers never offload
+    n_sensors = matrix.shape[1]
+    shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+    shared = np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shm.buf, order="F")
+    try:
+        shared[...] = matrix
+        pool = _get_offload_pool()
+        bounds = np.linspace(0, n_sensors, min(_offload["workers"], n_sensors) + 1).astype(int)
+        futures = [
+            pool.submit(_shared_robust_means, shm.name, matrix.shape, matrix.dtype.str,
+                        start, stop, k_outlier, max_frac)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        return np.concatenate([future.result() for future in futures])
+    finally:
+        del shared
+        shm.close()
+        shm.unlink()
+
+def dkw_sample_size(rank_error: float, confidence: float = 0.99) -> int:
+    """Samples needed so every empirical quantile is within ``rank_error`` in
+    rank with probability ``confidence`` (Dvoretzky-Kiefer-Wolfowitz)."""
+    return int(np.ceil(np.log(2 / (1 - confidence)) / (2 * rank_error ** 2)))
+
+def approximate_robust_means(matrix: np.ndarray, k_outlier: float = 3.5, max_frac: float = 0.05,
+                             sample_size: int = None, seed: int = 0) -> np.ndarray:
+    """robust_means with median and MAD estimated from a uniform row sample.
+
+    Only ``sample_size`` rows (by default the DKW size for a 1% rank error)
+    are partitioned; the outlier cut and trimmed
+    mean still use every sample, in one vectorized pass. Windows no larger
+    than the sample are computed exactly.
+    """
+    matrix = np.asarray(matrix)
+    if matrix.dtype != np.float32:
+        matrix = matrix.astype(float, copy=False)
+    if matrix.ndim == 1:
+        matrix = matrix[:, np.newaxis]
+    sample_size = sample_size or dkw_sample_size(0.01)
+    if matrix.shape[0] <= sample_size:
+        return robust_means(matrix, k_outlier, max_frac)
+    rows = np.sort(np.random.default_rng(seed).choice(matrix.shape[0], sample_size, replace=False))
+    sample = np.asfortranarray(matrix[rows])
+    sample_counts = (~np.isnan(sample)).sum(axis=0)
+    med = nan_median(sample, sample_counts)
+    mad = nan_median(np.abs(sample - med), sample_counts)
+    valid = ~np.isnan(matrix)
+    return _trimmed_means(matrix, valid, valid.sum(axis=0), np.abs(matrix - med), med, mad,
+                          k_outlier, max_frac)
+
 def adaptive_mean(vals: np.ndarray, k_outlier: float = 3.5, max_frac: float = 0.05) -> float:
-    if vals.size == 0:
-        return np.nan
-    med = np.median(vals)
-    mad = np.median(np.abs(vals - med))
-    if mad == 0:
-        return float(med)
-    sigma = 1.4826 * mad
-    mask_out = np.abs(vals - med) > k_outlier * sigma
-    if mask_out.sum() / vals.size <= max_frac:
-        vals = vals[~mask_out]
-    return float(vals.mean())
+    return float(robust_means(vals, k_outlier, max_frac)[0])
 
-def analyze_sensor_data_duo(data_list: list[dict],
-                        thresholds_json: dict,
-                        field_alias: dict,
-                        k_outlier: float = 3.5,
-                        max_frac: float = 0.05):
-    details = {}
-    for log_key, base in field_alias.items():
-        vals = np.fromiter((row[log_key] for row in data_list), dtype=float)
-        avg = adaptive_mean(vals, k_outlier, max_frac)
-        low = thresholds_json.get(f"{base}_healthy", float('-inf'))
-        high = thresholds_json.get(f"{base}_warning", float('inf'))
-        if low <= avg <= high:
-            status = "GOOD"
+def _sorted_stats(block: np.ndarray, k_outlier: float, max_frac: float):
+    # robust_means on every column of block, also returning median and MAD.
+    # Sorting (NaNs last) instead of np.partition keeps this fast when the
+    # columns hold different numbers of valid samples.
+    valid = ~np.isnan(block)
+    counts = valid.sum(axis=0)
+    lo = np.maximum((counts - 1) // 2, 0)
+    hi = np.maximum(counts // 2, lo)
+    cols = np.arange(block.shape[1])
+    ordered = np.sort(block, axis=0)
+    med = (ordered[lo, cols] + ordered[hi, cols]) / 2
+    med[counts == 0] = np.nan
+    dev = np.abs(block - med)
+    ordered = np.sort(dev, axis=0)
+    mad = (ordered[lo, cols] + ordered[hi, cols]) / 2
+    mad[counts == 0] = np.nan
+    means = _trimmed_means(block, valid, counts, dev, med, mad, k_outlier, max_frac)
+    return means, med, mad
+
+def bucket_robust_stats(matrix: np.ndarray, buckets: np.ndarray, n_buckets: int,
+                        k_outlier: float = 3.5, max_frac: float = 0.05):
+    """Robust mean, median and MAD of every (bucket, sensor) cell.
+
+    ``buckets`` gives each row's bucket in ``0..n_buckets-1`` and every
+    bucket must hold at least one row. Rows are grouped with one stable sort
+    and laid out as a NaN-padded (bucket size x sensors*buckets) block, so
+    all cells are sorted and reduced in single vectorized calls. When bucket
+    sizes are too uneven for padding, buckets are processed one at a time.
+    Per cell the result matches ``robust_means`` on that bucket's rows.
+    """
+    matrix = np.asarray(matrix)
+    if matrix.dtype != np.float32:
+        matrix = matrix.astype(float, copy=False)
+    n_rows, n_sensors = matrix.shape
+    by_bucket = np.argsort(buckets, kind="stable")
+    sizes = np.bincount(buckets, minlength=n_buckets)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    grouped = matrix[by_bucket]
+    if sizes.max(initial=0) * n_buckets <= 2 * n_rows:
+        # Column j * n_buckets + b of the block holds sensor j's samples in bucket b
+        padded = np.full((sizes.max(), n_sensors * n_buckets), np.nan, dtype=matrix.dtype, order="F")
+        bucket = buckets[by_bucket]
+        position = np.arange(n_rows) - starts[bucket]
+        for j in range(n_sensors):
+            padded[position, j * n_buckets + bucket] = grouped[:, j]
+        stats = _sorted_stats(padded, k_outlier, max_frac)
+        return tuple(stat.reshape(n_sensors, n_buckets).T for stat in stats)
+    stats = [_sorted_stats(grouped[start:start + size], k_outlier, max_frac)
+             for start, size in zip(starts.tolist(), sizes.tolist())]
+    return tuple(np.stack(stat) for stat in zip(*stats))
+
+class SensorSchema:
+    """Sensor layout compiled once: data key -> threshold keys -> health group.
+
+    Sensors of one group are stored next to each other so group verdicts are a
+    single ``np.logical_and.reduceat`` over the per-sensor band checks.
+    """
+    __slots__ = ("keys", "bases", "groups", "alias", "low_keys", "high_keys",
+                 "group_names", "group_starts")
+
+    def __init__(self, entries):
+        entries = list(entries)
+        order = {}
+        for _, _, group in entries:
+            order.setdefault(group, len(order))
+        entries = sorted(entries, key=lambda entry: order[entry[2]])
+        self.keys = tuple(key for key, _, _ in entries)
+        self.bases = tuple(base for _, base, _ in entries)
+        self.groups = tuple(group for _, _, group in entries)
+        self.alias = dict(zip(self.keys, self.bases))
+        self.low_keys = tuple(f"{base}_healthy" for base in self.bases)
+        self.high_keys = tuple(f"{base}_warning" for base in self.bases)
+        self.group_names = tuple(dict.fromkeys(self.groups))
+        self.group_starts = np.array([self.groups.index(g) for g in self.group_names])
+
+    @classmethod
+    def from_alias(cls, field_alias: dict, group: str = "sensor"):
+        return cls([(key, base, group) for key, base in field_alias.items()])
+
+    def bands(self, thresholds_json, strict: bool = False):
+        # Returns (low, high) float arrays aligned with self.keys.
+        if isinstance(thresholds_json, ThresholdProfile):
+            return thresholds_json.bands(self, strict)
+        if strict:
+            low = [thresholds_json[k] for k in self.low_keys]
+            high = [thresholds_json[k] for k in self.high_keys]
         else:
-            status = "NEEDS MAINTENANCE"
+            low = [thresholds_json.get(k, float('-inf')) for k in self.low_keys]
+            high = [thresholds_json.get(k, float('inf')) for k in self.high_keys]
+        return np.asarray(low, dtype=float), np.asarray(high, dtype=float)
+
+    def in_band(self, values: np.ndarray, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        return (low <= values) & (values <= high)
+
+    def group_health(self, in_band: np.ndarray) -> dict:
+        healthy = np.logical_and.reduceat(in_band, self.group_starts)
+        return dict(zip(self.group_names, healthy.tolist()))
+
+class ThresholdProfile:
+    """A thresholds dict with its per-schema low/high arrays resolved once."""
+    __slots__ = ("profile_id", "thresholds", "_bands")
+
+    def __init__(self, thresholds: dict, profile_id: str = None):
+        self.profile_id = profile_id
+        self.thresholds = thresholds
+        self._bands = {}
+
+    def __len__(self):
+        return len(self.thresholds)
+
+    def bands(self, schema: SensorSchema, strict: bool = False):
+        key = (schema.keys, strict)
+        cached = self._bands.get(key)
+        if cached is None:
+            low, high = schema.bands(self.thresholds, strict)
+            low.flags.writeable = False
+            high.flags.writeable = False
+            cached = self._bands[key] = (low, high)
+        return cached
+
+_schemas = {}
+
+def schema_for(field_alias: dict) -> SensorSchema:
+    for schema in (QUAD_SCHEMA, DUO_SCHEMA):
+        if field_alias is schema.alias or field_alias == schema.alias:
+            return schema
+    key = tuple(field_alias.items())
+    if key not in _schemas:
+        _schemas[key] = SensorSchema.from_alias(field_alias)
+    return _schemas[key]
+
+def evaluate_bands(averages: np.ndarray, thresholds_json: dict, schema: SensorSchema,
+                   approximation: dict = None) -> dict:
+    low, high = schema.bands(thresholds_json)
+    good = schema.in_band(averages, low, high).tolist()
+    details = {}
+    for log_key, avg, lo, hi, ok in zip(schema.keys, averages.tolist(), low.tolist(), high.tolist(), good):
         details[log_key] = {
             "average": avg,
-            "status": status,
-            "low": low,
-            "high": high
+            "status" : "GOOD" if ok else "NEEDS MAINTENANCE",
+            "low"    : lo,
+            "high"   : hi
         }
+        if approximation is not None:
+            details[log_key]["approximation"] = approximation
+    return details
+
+def _window_means(matrix, k_outlier, max_frac, rank_error=None, confidence=0.99):
+    # Exact robust means, or sampled median/MAD when rank_error is set and the
+    # window is larger than the DKW sample; the second value describes the
+    # approximation for the report (None when exact).
+    if rank_error is not None:
+        sample_size = dkw_sample_size(rank_error, confidence)
+        if matrix.shape[0] > sample_size:
+            averages = approximate_robust_means(matrix, k_outlier, max_frac, sample_size)
+            return averages, {"sample_size": sample_size, "rank_error": rank_error,
+                              "confidence": confidence}
+    return robust_means(matrix, k_outlier, max_frac), None
+
+def check_sensor_groups(data_list, thresholds_json: dict, schema: SensorSchema,
+                        strict: bool = False) -> dict:
+    # Plain-mean band check used by the check_health endpoints; missing sensor
+    # fields (and, when strict, missing thresholds) raise KeyError.
+    with stage("extract"):
+        matrix = sensor_matrix(data_list, schema.keys)
+    if matrix.shape[0] == 0:
+        raise ZeroDivisionError("Empty data list")
+    with stage("compute"):
+        low, high = schema.bands(thresholds_json, strict)
+        return schema.group_health(schema.in_band(matrix.mean(axis=0), low, high))
+
+def summarize(details: dict):
     if any(d["status"] == "NEEDS MAINTENANCE" for d in details.values()):
         overall = "MACHINE NEEDS MAINTENANCE"
     else:
@@ -45,83 +436,129 @@ def analyze_sensor_data_duo(data_list: list[dict],
             fld, info = item
             if info["average"] < info["low"]:
                 return info["low"] - info["average"]
-            else:
-                return info["average"] - info["high"]
+            return info["average"] - info["high"]
         fld, info = max(details.items(), key=deviation)
         direction = "below" if info["average"] < info["low"] else "above"
-        bound = info["low"] if direction == "below" else info["high"]
+        bound     = info["low"] if direction == "below" else info["high"]
         cause = (f"Issue in '{fld}': average {info['average']:.2f} is "
                  f"{direction} the acceptable band ({bound}).")
+    return overall, cause
+
+def analyze_sensor_data_duo(data_list: list[dict],
+                        thresholds_json: dict,
+                        field_alias: dict,
+                        k_outlier: float = 3.5,
+                        max_frac: float = 0.05,
+                        dtype=None,
+                        rank_error: float = None,
+                        confidence: float = 0.99):
+    schema = schema_for(field_alias)
+    with stage("extract"):
+        matrix = sensor_matrix(data_list, schema.keys, dtype=dtype)
+    with stage("compute"):
+        averages, approximation = _window_means(matrix, k_outlier, max_frac, rank_error, confidence)
+        details = evaluate_bands(averages, thresholds_json, schema, approximation)
+        overall, cause = summarize(details)
     return overall, cause, details
 
 def adaptive_mean_quad(vals: np.ndarray, k_outlier: float = 3.5, max_frac: float = 0.05) -> float:
-    if vals.size == 0:
-        return np.nan
-    med = np.median(vals)
-    mad = np.median(np.abs(vals - med))
-    if mad == 0:
-        return float(med)
-    sigma = 1.4826 * mad
-    mask_out = np.abs(vals - med) > k_outlier * sigma
-    if mask_out.sum() / vals.size <= max_frac:
-        vals = vals[~mask_out]
-    return float(vals.mean())
+    return float(robust_means(vals, k_outlier, max_frac)[0])
 
 def analyze_sensor_data_quad(data_list: list[dict],
                         thresholds_json: dict,
                         field_alias: dict,
                         k_outlier: float = 3.5,
-                        max_frac: float = 0.05):
-    details = {}
-    for log_key, base in field_alias.items():
-        vals = np.fromiter((row.get(log_key, np.nan) for row in data_list), dtype=float)
-        vals = vals[~np.isnan(vals)]
-        avg  = adaptive_mean_quad(vals, k_outlier, max_frac)
-        low  = thresholds_json.get(f"{base}_healthy", float('-inf'))
-        high = thresholds_json.get(f"{base}_warning", float('inf'))
-        status = "GOOD" if low <= avg <= high else "NEEDS MAINTENANCE"
-        details[log_key] = {
-            "average": avg,
-            "status" : status,
-            "low"    : low,
-            "high"   : high
-        }
-    if any(d["status"] == "NEEDS MAINTENANCE" for d in details.values()):
-        overall = "MACHINE NEEDS MAINTENANCE"
-    else:
-        overall = "MACHINE IS IN GOOD CONDITION"
-    if overall == "MACHINE IS IN GOOD CONDITION":
-        cause = "All parameters are within the specified bands."
-    else:
-        def deviation(item):
-            fld, info = item
-            if info["average"] < info["low"]:
-                return info["low"] - info["average"]
-            return info["average"] - info["high"]
-        fld, info = max(details.items(), key=deviation)
-        direction = "below" if info["average"] < info["low"] else "above"
-        bound     = info["low"] if direction == "below" else info["high"]
-        cause = (f"Issue in '{fld}': average {info['average']:.2f} is "
-                 f"{direction} the acceptable band ({bound}).")
+                        max_frac: float = 0.05,
+                        dtype=None,
+                        rank_error: float = None,
+                        confidence: float = 0.99):
+    schema = schema_for(field_alias)
+    with stage("extract"):
+        matrix = sensor_matrix(data_list, schema.keys, required=False, dtype=dtype)
+    with stage("compute"):
+        averages, approximation = _window_means(matrix, k_outlier, max_frac, rank_error, confidence)
+        details = evaluate_bands(averages, thresholds_json, schema, approximation)
+        overall, cause = summarize(details)
     return overall, cause, details
 
-field_alias_duo = {
-    "temperature_one": "temperature_skin",
-    "temperature_two": "temperature_bearing",
-    "vibration_x": "vibration_X",
-    "vibration_y": "vibration_Y",
-    "vibration_z": "vibration_Z"
-}
-
-field_alias = {
-    "temperature_one"  : "temperature_skin",
-    "temperature_two"  : "temperature_bearing",
-    "vibration_x"      : "vibration_X",
-    "vibration_y"      : "vibration_Y",
-    "vibration_z"      : "vibration_Z",
-    "magnetic_flux_x"  : "magnetic_flux_X",
-    "magnetic_flux_y"  : "magnetic_flux_Y",
-    "magnetic_flux_z"  : "magnetic_flux_Z",
-    "ultrasound_one"   : "ultrasound_one",
-    "ultrasound_two"   : "ultrasound_two"
-} 
\ No newline at end of file
+class TooManyBuckets(ValueError):
+    pass
+
+def trend_sensor_data(data_list,
+                      thresholds_json: dict,
+                      field_alias: dict,
+                      bucket_seconds: float,
+                      k_outlier: float = 3.5,
+                      max_frac: float = 0.05,
+                      dtype=None,
+                      max_buckets: int = None) -> list:
+    """Per time bucket: sample count, health verdict and per-sensor statistics.
+
+    Samples need a ``timestamp`` (epoch seconds); samples without one are
+    ignored. Buckets are ``bucket_seconds`` wide, aligned to the epoch, and
+    only non-empty buckets are returned, oldest first. Raises KeyError when
+    no sample has a timestamp, ValueError when columns differ in length and
+    TooManyBuckets past ``max_buckets``.
+    """
+    schema = schema_for(field_alias)
+    with stage("extract"):
+        window = SensorWindow.from_data(data_list, schema.keys, dtype=dtype, timestamp_key=TIMESTAMP_KEY)
+        if window.timestamps is None:
+            raise KeyError(TIMESTAMP_KEY)
+        timestamps = window.timestamps
+        matrix = window.select(schema.keys, required=False)
+        stamped = ~np.isnan(timestamps)
+        if not stamped.all():
+            timestamps, matrix = timestamps[stamped], matrix[stamped]
+        if timestamps.size == 0:
+            raise KeyError(TIMESTAMP_KEY)
+        labels, buckets = np.unique(np.floor_divide(timestamps, bucket_seconds), return_inverse=True)
+        if max_buckets is not None and labels.size > max_buckets:
+            raise TooManyBuckets(labels.size)
+    with stage("compute"):
+        means, medians, mads = bucket_robust_stats(matrix, buckets, labels.size, k_outlier, max_frac)
+        samples = np.bincount(buckets, minlength=labels.size)
+        trend = []
+        for label, count, avg, med, mad in zip(labels.tolist(), samples.tolist(), means, medians, mads):
+            details = evaluate_bands(avg, thresholds_json, schema)
+            for info, m, d in zip(details.values(), med.tolist(), mad.tolist()):
+                info["median"] = m
+                info["mad"] = d
+            overall, cause = summarize(details)
+            trend.append({
+                "start": label * bucket_seconds,
+                "samples": count,
+                "overall_health": "Healthy" if overall == "MACHINE IS IN GOOD CONDITION" else "Unhealthy",
+                "possible_cause": cause,
+                "details": details
+            })
+    return trend
+
+SENSOR_SCHEMA = (
+    # (data_list key,   threshold base,        health group)
+    ("temperature_one", "temperature_skin",    "temperature"),
+    ("temperature_two", "temperature_bearing", "temperature"),
+    ("vibration_x",     "vibration_X",         "vibration"),
+    ("vibration_y",     "vibration_Y",         "vibration"),
+    ("vibration_z",     "vibration_Z",         "vibration"),
+    ("magnetic_flux_x", "magnetic_flux_X",     "magnetic_flux"),
+    ("magnetic_flux_y", "magnetic_flux_Y",     "magnetic_flux"),
+    ("magnetic_flux_z", "magnetic_flux_Z",     "magnetic_flux"),
+    ("ultrasound_one",  "ultrasound_one",      "ultrasound"),
+    ("ultrasound_two",  "ultrasound_two",      "ultrasound"),
+)
+
+DUO_GROUPS = ("temperature", "vibration")
+
+# Optional per-sample epoch time carried next to the sensor readings
+TIMESTAMP_KEY = "timestamp"
+
+# Precision the robust statistics run in (Config.COMPUTE_PRECISION or "precision" per request)
+PRECISIONS = {"float64": np.float64, "float32": np.float32}
+
+QUAD_SCHEMA = SensorSchema(SENSOR_SCHEMA)
+DUO_SCHEMA = SensorSchema([entry for entry in SENSOR_SCHEMA if entry[2] in DUO_GROUPS])
+
+field_alias_duo = DUO_SCHEMA.alias
+
+field_alias = QUAD_SCHEMA.alias
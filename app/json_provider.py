@@ -0,0 +1,91 @@
+import json
+import math
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+from app.timing import stage
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder below is used instead
+    orjson = None
+
+
+def _finite(obj):
+    # Stdlib fallback only: replace NaN/inf (which json.dumps writes as bare
+    # NaN/Infinity, i.e. invalid JSON) with None, converting NumPy values too.
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _finite(obj.tolist())
+    if isinstance(obj, np.generic):
+        return _finite(obj.item())
+    return obj
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, with the stdlib encoder as fallback.
+
+    NumPy scalars and arrays serialize natively, and NaN/inf are always
+    written as ``null`` so responses stay valid JSON. Decoding is attributed
+    to the "parse" timing stage and encoding to "serialize".
+    """
+
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return DefaultJSONProvider.default(obj)
+
+    def _options(self, pretty: bool = False) -> int:
+        options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dump_bytes(self, obj, pretty: bool = False) -> bytes:
+        with stage("serialize"):
+            if orjson is not None:
+                try:
+                    return orjson.dumps(obj, default=self.default, option=self._options(pretty))
+                except TypeError:
+                    pass  # e.g. integers beyond 64 bits; let the stdlib encoder try
+            kwargs = {"indent": 2} if pretty else {"separators": (",", ":")}
+            return self._stdlib_dumps(obj, **kwargs).encode()
+
+    def _stdlib_dumps(self, obj, **kwargs) -> str:
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        try:
+            return json.dumps(obj, allow_nan=False, **kwargs)
+        except ValueError:
+            return json.dumps(_finite(obj), **kwargs)
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            with stage("serialize"):
+                return self._stdlib_dumps(obj, **kwargs)
+        return self.dump_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        with stage("parse"):
+            if orjson is not None and not kwargs:
+                try:
+                    return orjson.loads(s)
+                except orjson.JSONDecodeError:
+                    pass  # NaN/Infinity literals and other stdlib extensions
+            return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dump_bytes(obj, pretty) + b"\n", mimetype=self.mimetype)
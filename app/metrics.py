@@ -0,0 +1,68 @@
+import os
+from time import perf_counter
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+from app.timing import start_timing, stop_timing
+
+# Metrics are process-wide. Under gunicorn, set PROMETHEUS_MULTIPROC_DIR before
+# start-up so every worker writes its samples there and /metrics aggregates them.
+REQUESTS = Counter("asset_health_requests_total", "HTTP requests handled",
+                   ["endpoint", "method", "status"])
+LATENCY = Histogram("asset_health_request_seconds", "End-to-end request latency", ["endpoint"],
+                    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+STAGE_LATENCY = Histogram("asset_health_stage_seconds", "Time spent per processing stage",
+                          ["endpoint", "stage"],
+                          buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                                   0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+REQUEST_BYTES = Histogram("asset_health_request_bytes", "Request body size", ["endpoint"],
+                          buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864))
+RESPONSE_BYTES = Histogram("asset_health_response_bytes", "Response body size", ["endpoint"],
+                           buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304))
+
+
+def endpoint_label() -> str:
+    # The URL rule, not the raw path, keeps label cardinality bounded
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def render_metrics() -> bytes:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+def register_metrics(app):
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = perf_counter()
+        start_timing()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop("metrics_started", None)
+        timings = stop_timing()
+        if started is None or request.endpoint == "metrics":
+            return response
+        endpoint = endpoint_label()
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        LATENCY.labels(endpoint).observe(perf_counter() - started)
+        REQUEST_BYTES.labels(endpoint).observe(request.content_length or 0)
+        if not response.is_streamed:
+            RESPONSE_BYTES.labels(endpoint).observe(response.calculate_content_length() or 0)
+        for name, seconds in timings.items():
+            STAGE_LATENCY.labels(endpoint, name).observe(seconds)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,197 @@
+from array import array
+
+import numpy as np
+from flask import current_app, request
+
+from app.health_utils import SensorWindow, TIMESTAMP_KEY
+from app.timing import stage
+
+NPY_TYPES = ("application/x-npy", "application/vnd.numpy")
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+ARROW_TYPES = ("application/vnd.apache.arrow.stream", "application/vnd.apache.arrow.file")
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/jsonlines")
+NDJSON_CHUNK_BYTES = 1 << 16
+NDJSON_HEADER_KEYS = ("thresholds", "profile_id", "asset_id", "precision", "approximate", "bucket_seconds")
+# Query parameters that are request options rather than thresholds
+OPTION_ARGS = ("precision", "approximate", "bucket_seconds", "start", "end", "limit", "granularity")
+
+
+class UnsupportedPayload(ValueError):
+    pass
+
+
+def thresholds_from_args(args) -> dict:
+    # Binary bodies only carry samples; thresholds travel in the query string.
+    try:
+        return {key: float(value) for key, value in args.items() if key not in OPTION_ARGS}
+    except ValueError as e:
+        raise UnsupportedPayload(f"Invalid threshold value: {e}")
+
+
+def decode_npy(body: bytes, columns=None) -> dict:
+    # Read the .npy header ourselves so the samples stay a view on the body.
+    buffer = memoryview(body)
+    stream = _BufferReader(buffer)
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    elif version in ((2, 0), (3, 0)):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    else:
+        raise UnsupportedPayload(f"Unsupported .npy version {version}")
+    if dtype.hasobject:
+        raise UnsupportedPayload("Object arrays are not accepted")
+    count = int(np.prod(shape, dtype=np.int64))
+    values = np.frombuffer(buffer, dtype=dtype, count=count, offset=stream.offset)
+    values = values.reshape(shape, order="F" if fortran_order else "C")
+
+    if dtype.names:
+        return {name: values[name] for name in dtype.names}
+    if values.ndim != 2:
+        raise UnsupportedPayload("Expected a structured array or a 2-D (samples x sensors) matrix")
+    if not columns or len(columns) != values.shape[1]:
+        raise UnsupportedPayload("A 2-D matrix needs one name per column in the 'columns' parameter")
+    # A Fortran-ordered float matrix becomes the window without a copy; a
+    # timestamp column becomes the window's timestamps (still a view when it
+    # is the first or last column)
+    timestamps = None
+    if TIMESTAMP_KEY in columns:
+        i = columns.index(TIMESTAMP_KEY)
+        timestamps = values[:, i]
+        if i in (0, len(columns) - 1):
+            values = values[:, 1:] if i == 0 else values[:, :-1]
+        else:
+            values = np.delete(values, i, axis=1)
+        columns = columns[:i] + columns[i + 1:]
+    return SensorWindow(values, columns, timestamps)
+
+
+def decode_msgpack(body: bytes) -> dict:
+    try:
+        import msgpack
+    except ImportError:
+        raise UnsupportedPayload("MessagePack support is not installed")
+    data = msgpack.unpackb(body, raw=False)
+    data_list = data.get("data_list") if isinstance(data, dict) else None
+    if isinstance(data_list, dict):
+        # Columns may be sent as raw little-endian float64 buffers
+        data["data_list"] = {
+            key: np.frombuffer(col, dtype="<f8") if isinstance(col, (bytes, bytearray)) else col
+            for key, col in data_list.items()
+        }
+    return data
+
+
+def decode_arrow(body: bytes, file_format: bool = False) -> dict:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise UnsupportedPayload("Arrow support is not installed")
+    if file_format:
+        table = pa.ipc.open_file(pa.py_buffer(body)).read_all()
+    else:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    return {
+        name: table.column(name).to_numpy().astype(float, copy=False)
+        for name in table.column_names
+    }
+
+
+def decode_ndjson(stream, args) -> dict:
+    """Read one sample per line into a SensorWindow.
+
+    The body is consumed in NDJSON_CHUNK_BYTES pieces and each chunk's rows
+    are appended to ``array('d')`` columns, so only one chunk of parsed
+    dicts is alive at a time. A ``timestamp`` field becomes the window's
+    timestamps. A first line holding ``thresholds``,
+    ``profile_id`` or ``asset_id`` is the request header; without one,
+    thresholds and ``profile_id`` come from the query string.
+    """
+    args = {k: v for k, v in args.items() if k not in OPTION_ARGS}
+    header = {}
+    if "profile_id" in args:
+        header["profile_id"] = args.pop("profile_id")
+    if args:
+        header["thresholds"] = thresholds_from_args(args)
+
+    loads = current_app.json.loads
+    nan = float("nan")
+    columns = {}
+    count = 0
+    first = True
+    pending = b""
+    while True:
+        chunk = stream.read(NDJSON_CHUNK_BYTES)
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop() if chunk else b""
+        lines = [line for line in lines if line.strip()]
+        if lines:
+            rows = loads(b"[" + b",".join(lines) + b"]")
+            if first and isinstance(rows[0], dict) and any(k in rows[0] for k in NDJSON_HEADER_KEYS):
+                header.update(rows.pop(0))
+            first = False
+            if not all(isinstance(row, dict) for row in rows):
+                raise UnsupportedPayload("Every NDJSON line must be an object")
+            for key in set().union(*rows) - columns.keys():
+                columns[key] = array("d", [nan]) * count
+            for key, column in columns.items():
+                column.extend([nan if (v := row.get(key)) is None else v for row in rows])
+            count += len(rows)
+        if not chunk:
+            break
+
+    timestamps = columns.pop(TIMESTAMP_KEY, None)
+    keys = list(columns)
+    values = np.empty((count, len(keys)), order="F")
+    for i, key in enumerate(keys):
+        values[:, i] = np.frombuffer(columns.pop(key), dtype=np.float64)
+    data = dict(header)
+    data["data_list"] = SensorWindow(
+        values, keys, None if timestamps is None else np.frombuffer(timestamps, dtype=np.float64)
+    )
+    return data
+
+
+def load_payload():
+    """Decode the request body into the dict shape the JSON endpoints accept.
+
+    Returns ``None`` when the body cannot be read so callers keep their
+    existing "Unsupported Media Type" handling.
+    """
+    with stage("parse"):
+        return _decode_request()
+
+
+def _decode_request():
+    mimetype = request.mimetype
+    if mimetype in NDJSON_TYPES:
+        return decode_ndjson(request.stream, request.args.to_dict())
+    if mimetype in MSGPACK_TYPES:
+        return decode_msgpack(request.get_data())
+    if mimetype in NPY_TYPES or mimetype in ARROW_TYPES:
+        args = request.args.to_dict()
+        columns = args.pop("columns", "")
+        columns = [c for c in columns.split(",") if c]
+        profile_id = args.pop("profile_id", None)
+        if mimetype in NPY_TYPES:
+            data_list = decode_npy(request.get_data(), columns)
+        else:
+            data_list = decode_arrow(request.get_data(), mimetype == ARROW_TYPES[1])
+        data = {"data_list": data_list, "thresholds": thresholds_from_args(args)}
+        if profile_id is not None:
+            data["profile_id"] = profile_id
+        return data
+    return request.get_json()
+
+
+class _BufferReader:
+    # Minimal file-like wrapper so numpy's header readers work on a memoryview
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.offset = 0
+
+    def read(self, size=-1):
+        end = len(self.buffer) if size < 0 else self.offset + size
+        chunk = self.buffer[self.offset:end].tobytes()
+        self.offset += len(chunk)
+        return chunk
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+
+from app.health_utils import ThresholdProfile
+
+
+def profile_id_for(thresholds: dict) -> str:
+    # Content hash, so uploading the same profile twice yields the same ID
+    canonical = json.dumps(thresholds, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def threshold_error(thresholds: dict) -> str:
+    """Why a thresholds dict cannot be used as a profile, or None when it can.
+
+    Every value must be a finite number, and each ``<base>_healthy`` low
+    bound must not exceed its ``<base>_warning`` high bound.
+    """
+    for key, value in thresholds.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return f"Threshold '{key}' must be a finite number"
+    for key, low in thresholds.items():
+        if key.endswith("_healthy"):
+            high = thresholds.get(key[:-len("_healthy")] + "_warning")
+            if high is not None and low > high:
+                return f"Threshold '{key}' is above its '_warning' bound"
+    return None
+
+
+class ProfileRegistry:
+    """Server-side threshold profiles, least recently used evicted first.
+
+    Profiles live in this process only: with several workers, a profile is
+    known to the worker that registered it.
+    """
+
+    def __init__(self, max_profiles: int):
+        self.max_profiles = max_profiles
+        self.profiles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, thresholds: dict) -> ThresholdProfile:
+        profile_id = profile_id_for(thresholds)
+        with self.lock:
+            profile = self.profiles.get(profile_id)
+            if profile is None:
+                profile = self.profiles[profile_id] = ThresholdProfile(thresholds, profile_id)
+                while len(self.profiles) > self.max_profiles:
+                    self.profiles.popitem(last=False)
+            else:
+                self.profiles.move_to_end(profile_id)
+            return profile
+
+    def get(self, profile_id) -> ThresholdProfile:
+        if not isinstance(profile_id, str):  # e.g. a list from a JSON body: never registered
+            return None
+        with self.lock:
+            profile = self.profiles.get(profile_id)
+            if profile is not None:
+                self.profiles.move_to_end(profile_id)
+            return profile
+
+    def thresholds_for(self, data: dict, default=None):
+        """Thresholds referenced by a request: a registered profile or an inline dict.
+
+        Returns ``(thresholds, unknown_profile_id)``; the second item is set
+        when the request names a profile that is not registered.
+        """
+        profile_id = data.get("profile_id")
+        if profile_id is None:
+            return data.get("thresholds", default), None
+        profile = self.get(profile_id)
+        return profile, (profile_id if profile is None else None)
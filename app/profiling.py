@@ -0,0 +1,97 @@
+import cProfile
+import os
+import pstats
+import time
+import uuid
+from time import perf_counter
+
+from flask import g, request
+
+from app.timing import current_timings, start_timing, stop_timing
+
+PROFILE_HEADER = "X-Profile"
+
+
+def top_frames(profiler: cProfile.Profile, limit: int) -> list:
+    """The ``limit`` functions with the highest cumulative time, as short strings."""
+    stats = pstats.Stats(profiler)
+    stats.sort_stats("cumulative")
+    frames = []
+    for filename, line, func in stats.fcn_list:
+        if func in ("disable", "<method 'disable' of '_lsprof.Profiler' objects>"):
+            continue
+        _, ncalls, _, cumtime, _ = stats.stats[(filename, line, func)]
+        location = f"{os.path.basename(filename)}:{line}" if line else "~"
+        frames.append(f"{func}@{location};calls={ncalls};cum={cumtime * 1000:.2f}ms")
+        if len(frames) >= limit:
+            break
+    return frames
+
+
+def server_timing(timings: dict, total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+
+def write_profile(profiler: cProfile.Profile, directory: str, keep: int) -> str:
+    # One .prof file per profiled request; only the newest `keep` are retained
+    os.makedirs(directory, exist_ok=True)
+    endpoint = (request.endpoint or "unmatched").replace("/", "_")
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{endpoint}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".prof")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in profiles[:max(len(profiles) - keep, 0)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+    return profile_id
+
+
+def register_profiling(app):
+    """Opt-in cProfile run of single requests.
+
+    ``PROFILING_ENABLED`` profiles every request; ``PROFILING_ALLOW_HEADER``
+    profiles only requests that send ``X-Profile: 1``. Profiled responses get
+    a ``Server-Timing`` header with the stage timings and an ``X-Profile-Top``
+    header with the hottest functions. With ``PROFILE_DIR`` set, the full
+    profile is also written there for ``pstats``/snakeviz.
+    """
+    if not (app.config["PROFILING_ENABLED"] or app.config["PROFILING_ALLOW_HEADER"]):
+        return
+
+    @app.before_request
+    def start_profiler():
+        wanted = app.config["PROFILING_ENABLED"] or (
+            app.config["PROFILING_ALLOW_HEADER"] and request.headers.get(PROFILE_HEADER) in ("1", "true")
+        )
+        if not wanted:
+            return
+        g.profile_owns_timing = current_timings() is None
+        if g.profile_owns_timing:
+            start_timing()
+        g.profile_started = perf_counter()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    @app.after_request
+    def attach_profile(response):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        total = perf_counter() - g.pop("profile_started")
+        timings = dict(current_timings() or {})
+        if g.pop("profile_owns_timing", False):
+            stop_timing()
+        response.headers["Server-Timing"] = server_timing(timings, total)
+        response.headers["X-Profile-Top"] = " | ".join(top_frames(profiler, app.config["PROFILE_TOP_N"]))
+        if app.config["PROFILE_DIR"]:
+            response.headers["X-Profile-Id"] = write_profile(
+                profiler, app.config["PROFILE_DIR"], app.config["PROFILE_KEEP"]
+            )
+        return response
@@ -0,0 +1,309 @@
+import math
+import threading
+
+import numpy as np
+
+from app.archive import START, STOP, T_MAX
+
+# Rollup periods and their width in seconds
+GRANULARITIES = {"minute": 60, "hour": 3600, "day": 86400}
+# Quantiles read from a sketch are within this fraction of the true value
+SKETCH_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# Magnitudes below this are counted as zero
+_MIN_MAGNITUDE = 1e-9
+QUANTILES = {"p05": 0.05, "p50": 0.5, "p95": 0.95}
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch (DDSketch) with relative accuracy SKETCH_ACCURACY.
+
+    A value x > 0 is counted in bin ``ceil(log_gamma(x))``, whose
+    representative is within SKETCH_ACCURACY of every value in it; negative
+    values use a mirrored set of bins. The bin count grows with the log of
+    the value range, not with the number of samples, and two sketches merge
+    by adding their bin counts.
+    """
+    __slots__ = ("positive", "negative", "zeros")
+
+    def __init__(self):
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+
+    def merge(self, other: "QuantileSketch"):
+        for bins, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in theirs.items():
+                bins[key] = bins.get(key, 0) + count
+        self.zeros += other.zeros
+
+    def points(self):
+        """(representative values ascending, counts) of the non-empty bins."""
+        negative = sorted(self.negative, reverse=True)
+        positive = sorted(self.positive)
+        keys = np.array(negative + positive, dtype=float)
+        values = 2 * _GAMMA ** keys / (_GAMMA + 1)
+        values[:len(negative)] *= -1
+        counts = [self.negative[k] for k in negative] + [self.positive[k] for k in positive]
+        if self.zeros:
+            values = np.insert(values, len(negative), 0.0)
+            counts.insert(len(negative), self.zeros)
+        return values, np.array(counts, dtype=np.int64)
+
+
+def _bin_counts(groups: np.ndarray, magnitudes: np.ndarray, n_groups: int) -> list:
+    # {bin: count} of the magnitudes in each group; `groups` must be ascending
+    counts = [{} for _ in range(n_groups)]
+    if magnitudes.size:
+        bins = np.ceil(np.log(magnitudes) / _LOG_GAMMA).astype(np.int64)
+        low = int(bins.min())
+        span = int(bins.max()) - low + 1
+        codes, sizes = np.unique(groups * span + (bins - low), return_counts=True)
+        bounds = np.searchsorted(codes // span, np.arange(n_groups + 1)).tolist()
+        keys, sizes = (codes % span + low).tolist(), sizes.tolist()
+        for g in range(n_groups):
+            if bounds[g] < bounds[g + 1]:
+                counts[g] = dict(zip(keys[bounds[g]:bounds[g + 1]], sizes[bounds[g]:bounds[g + 1]]))
+    return counts
+
+
+def _weighted_median(values: np.ndarray, counts: np.ndarray) -> float:
+    # Mean of the two middle order statistics, as the exact engine computes it
+    cumulative = np.cumsum(counts)
+    n = cumulative[-1]
+    lower, upper = np.searchsorted(cumulative, [(n - 1) // 2, n // 2], side="right")
+    return (values[lower] + values[upper]) / 2
+
+
+class Rollup:
+    """Per-sensor count, sum, sum of squares, min, max and quantile sketch over one period."""
+    __slots__ = ("count", "total", "squares", "low", "high", "sketches")
+
+    def __init__(self, n_sensors: int):
+        self.count = np.zeros(n_sensors, dtype=np.int64)
+        self.total = np.zeros(n_sensors)
+        self.squares = np.zeros(n_sensors)
+        self.low = np.full(n_sensors, np.inf)
+        self.high = np.full(n_sensors, -np.inf)
+        self.sketches = [QuantileSketch() for _ in range(n_sensors)]
+
+    @classmethod
+    def grouped(cls, matrix: np.ndarray, starts: np.ndarray) -> list:
+        """One Rollup per group of consecutive rows of a (samples x sensors) block.
+
+        Group ``g`` is rows ``starts[g]:starts[g + 1]``; NaN marks a missing
+        reading. Every statistic is reduced over all groups at once.
+        """
+        n_groups, n_sensors = len(starts), matrix.shape[1]
+        valid = ~np.isnan(matrix)
+        filled = np.where(valid, matrix, 0.0)
+        groups = np.repeat(np.arange(n_groups), np.diff(np.append(starts, len(matrix))))
+        count = np.add.reduceat(valid.astype(np.int64), starts, axis=0)
+        total = np.add.reduceat(filled, starts, axis=0)
+        squares = np.add.reduceat(filled * filled, starts, axis=0)
+        low = np.minimum.reduceat(np.where(valid, matrix, np.inf), starts, axis=0)
+        high = np.maximum.reduceat(np.where(valid, matrix, -np.inf), starts, axis=0)
+        rollups = []
+        for g in range(n_groups):
+            rollup = cls(n_sensors)
+            rollup.count, rollup.total, rollup.squares = count[g], total[g], squares[g]
+            rollup.low, rollup.high = low[g], high[g]
+            rollups.append(rollup)
+        for i in range(n_sensors):
+            column = matrix[:, i]
+            positive = column > _MIN_MAGNITUDE
+            negative = column < -_MIN_MAGNITUDE
+            zeros = np.add.reduceat((valid[:, i] & ~positive & ~negative).astype(np.int64), starts)
+            for rollup, pos, neg, n_zeros in zip(rollups, _bin_counts(groups[positive], column[positive], n_groups),
+                                                 _bin_counts(groups[negative], -column[negative], n_groups),
+                                                 zeros.tolist()):
+                sketch = rollup.sketches[i]
+                sketch.positive, sketch.negative, sketch.zeros = pos, neg, n_zeros
+        return rollups
+
+    def merge(self, other: "Rollup"):
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        self.low = np.minimum(self.low, other.low)
+        self.high = np.maximum(self.high, other.high)
+        for sketch, theirs in zip(self.sketches, other.sketches):
+            sketch.merge(theirs)
+
+    def _points(self, i: int):
+        # Bin representatives clipped to the exact min/max, so a constant
+        # sensor (or one inside a single bin) is summarized exactly
+        values, counts = self.sketches[i].points()
+        return np.clip(values, self.low[i], self.high[i]), counts
+
+    def robust_means(self, k_outlier: float = 3.5, max_frac: float = 0.05) -> np.ndarray:
+        """The engine's trimmed means, with median/MAD and the trimmed tails read from the sketches.
+
+        Within SKETCH_ACCURACY of the exact figures while a sensor's MAD is
+        at least SKETCH_ACCURACY of its median. A smaller MAD reads as 0,
+        since over half the readings share the median's bin, and the bin's
+        value is returned as the exact engine returns the median when the
+        MAD is 0. Readings spread inside the bin are then off by up to its
+        width (2 * SKETCH_ACCURACY), and if more than ``max_frac`` of them
+        lie outside it the exact engine returns their plain mean instead.
+        """
+        means = np.full(len(self.sketches), np.nan)
+        for i in range(len(self.sketches)):
+            n = self.count[i]
+            if n == 0:
+                continue
+            values, counts = self._points(i)
+            med = _weighted_median(values, counts)
+            dev = np.abs(values - med)
+            order = np.argsort(dev, kind="stable")
+            mad = _weighted_median(dev[order], counts[order])
+            if mad == 0:
+                means[i] = med
+                continue
+            out = dev > k_outlier * 1.4826 * mad
+            n_out = counts[out].sum()
+            if n_out / n <= max_frac:
+                means[i] = (self.total[i] - (values[out] * counts[out]).sum()) / (n - n_out)
+            else:
+                means[i] = self.total[i] / n
+        return means
+
+    def stats(self, keys) -> dict:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.total / self.count
+            std = np.sqrt(np.maximum(self.squares / self.count - mean * mean, 0.0))
+        result = {}
+        for i, key in enumerate(keys):
+            n = int(self.count[i])
+            entry = {"count": n, "mean": float(mean[i]), "std": float(std[i]),
+                     "min": float(self.low[i]) if n else None, "max": float(self.high[i]) if n else None}
+            values, counts = self._points(i)
+            cumulative = np.cumsum(counts)
+            for name, q in QUANTILES.items():
+                entry[name] = float(values[np.searchsorted(cumulative, q * (n - 1), side="right")]) if n else None
+            result[key] = entry
+        return result
+
+
+class AssetRollups:
+    __slots__ = ("generation", "covered", "buckets", "latest", "lock")
+
+    def __init__(self, generation: str = None):
+        self.generation = generation  # archive generation the rows were read from
+        self.covered = 0  # archive rows folded in so far
+        self.buckets = {name: {} for name in GRANULARITIES}
+        self.latest = {}
+        self.lock = threading.Lock()
+
+
+class RollupStore:
+    """Minute, hour and day rollups of each archived asset, kept in memory.
+
+    The archive stays the source of truth: ``refresh`` folds in only the
+    rows appended since the asset was last seen, by this worker or another
+    one sharing the archive, so after a restart the history is read once
+    and afterwards each append costs its own size. A summary is then merged
+    from at most ``retention[granularity]`` buckets, whatever number of
+    samples they hold. Only the newest ``retention`` buckets per granularity
+    are kept, and older ones are never built: rows are folded one index
+    block at a time, newest first, and blocks older than every retained
+    bucket are not read. An asset dropped and
+    re-created in the archive, by any worker, has a new generation and its
+    rollups are rebuilt.
+    """
+
+    def __init__(self, archive, retention: dict):
+        self.archive = archive
+        self.retention = retention
+        self.assets = {}
+        self.lock = threading.Lock()
+
+    def refresh(self, asset_id: str) -> AssetRollups:
+        """Bring an asset's rollups up to date with the archive; None for an unknown asset."""
+        generation = self.archive.generation(asset_id)
+        count = self.archive.samples(asset_id)
+        with self.lock:
+            state = self.assets.get(asset_id)
+            if count == 0:
+                self.assets.pop(asset_id, None)
+                return None
+            if state is None or state.generation != generation or state.covered > count:
+                state = self.assets[asset_id] = AssetRollups(generation)
+        with state.lock:
+            if state.covered < count:
+                # One index block at a time, newest first, so memory stays
+                # bounded and blocks older than every retained bucket are
+                # never read
+                blocks = self.archive.blocks(asset_id)
+                blocks = blocks[(blocks[:, STOP] > state.covered) & (blocks[:, START] < count)]
+                for block in blocks[np.argsort(-blocks[:, T_MAX], kind="stable")]:
+                    if self._expired(state, block[T_MAX]):
+                        break
+                    first = max(int(block[START]), state.covered)
+                    self._fold(state, self.archive.rows(asset_id, first, min(int(block[STOP]), count)))
+                state.covered = count
+        return state
+
+    def _expired(self, state: AssetRollups, timestamp: float) -> bool:
+        # Whether rows up to `timestamp` would only land in buckets older
+        # than the retained ones at every granularity
+        minute = math.floor(timestamp / 60) * 60
+        for name, width in GRANULARITIES.items():
+            buckets = state.buckets[name]
+            if len(buckets) < self.retention[name] or minute // width * width >= min(buckets):
+                return False
+        return True
+
+    def _fold(self, state: AssetRollups, window):
+        order = np.argsort(window.timestamps, kind="stable")
+        minutes = np.floor(window.timestamps[order] / 60).astype(np.int64) * 60
+        values = window.values[order]
+        for name, width in GRANULARITIES.items():
+            keys = minutes // width * width
+            buckets = state.buckets[name]
+            state.latest[name] = max(state.latest.get(name, keys[-1]), int(keys[-1]))
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            # Rows of buckets that would fall out of retention right away are skipped
+            kept = sorted(set(keys[starts].tolist()) | set(buckets))[-self.retention[name]:]
+            starts = starts[np.searchsorted(keys[starts], kept[0]):]
+            if len(starts):
+                first = starts[0]
+                for key, rollup in zip(keys[starts].tolist(), Rollup.grouped(values[first:], starts - first)):
+                    if key in buckets:
+                        buckets[key].merge(rollup)
+                    else:
+                        buckets[key] = rollup
+            excess = len(buckets) - self.retention[name]
+            if excess > 0:
+                for key in sorted(buckets)[:excess]:
+                    del buckets[key]
+
+    def summary(self, asset_id: str, granularity: str, start: float = None, end: float = None):
+        """Merged rollup of the buckets starting in ``[start, end)``, or the latest bucket.
+
+        Returns ``(first bucket start, last bucket end, Rollup)``, with both
+        bounds None when no bucket matches, or None for an unknown asset.
+        """
+        state = self.refresh(asset_id)
+        if state is None:
+            return None
+        width = GRANULARITIES[granularity]
+        with state.lock:
+            buckets = state.buckets[granularity]
+            if start is None and end is None:
+                keys = [state.latest[granularity]]
+            else:
+                start = -np.inf if start is None else start
+                end = np.inf if end is None else end
+                keys = sorted(key for key in buckets if start <= key < end)
+            merged = Rollup(len(self.archive.keys))
+            for key in keys:
+                merged.merge(buckets[key])
+        if not keys:
+            return None, None, merged
+        return keys[0], keys[-1] + width, merged
+
+    def drop(self, asset_id: str):
+        with self.lock:
+            self.assets.pop(asset_id, None)
@@ -1,12 +1,21 @@
-from flask import request, jsonify
-import numpy as np
+import math
+from functools import wraps
+from flask import request, jsonify, stream_with_context
 import warnings
 import logging
 from datetime import datetime, timezone
 from app.health_utils import (
     analyze_sensor_data_duo, analyze_sensor_data_quad,
-    field_alias_duo, field_alias
+    field_alias_duo, field_alias, evaluate_bands, summarize,
+    check_sensor_groups, is_columnar, trend_sensor_data, TooManyBuckets, SensorWindow,
+    DUO_SCHEMA, QUAD_SCHEMA, PRECISIONS, TIMESTAMP_KEY, ThresholdProfile
 )
+from app.payloads import load_payload, NDJSON_TYPES
+from app.streaming import StreamStore
+from app.profiles import ProfileRegistry, threshold_error
+from app.cache import ResponseCache
+from app.archive import SampleArchive
+from app.rollups import RollupStore, GRANULARITIES, SKETCH_ACCURACY
 
 start_time = datetime.now(timezone.utc)
 
@@ -14,7 +23,112 @@ warnings.filterwarnings("ignore")
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
 logging.basicConfig(level=logging.INFO)
 start_time = datetime.now(timezone.utc)
+
+def build_report(analyzer, data_list, thresholds, alias, **options):
+    overall_status, possible_cause, details = analyzer(data_list, thresholds, alias, **options)
+    overall_health = "Healthy" if overall_status == "MACHINE IS IN GOOD CONDITION" else "Unhealthy"
+    return {
+        "overall_health": overall_health,
+        "possible_cause": possible_cause,
+        "details": details
+    }
+
+def iter_batch(jobs, analyzer, alias, default_thresholds=None, profiles=None, options=None):
+    """Evaluate every job independently so one bad asset does not fail the batch.
+
+    Results are yielded as each job finishes, in job order.
+    """
+    for index, job in enumerate(jobs):
+        if not isinstance(job, dict):
+            yield {"asset_id": None, "error": f"Job {index} is not an object"}
+            continue
+        asset_id = job.get("asset_id")
+        data_list = job.get("data_list")
+        try:
+            if profiles is not None:
+                thresholds, unknown = profiles.thresholds_for(job, default_thresholds)
+                if unknown:
+                    yield {"asset_id": asset_id, "error": f"Unknown threshold profile '{unknown}'"}
+                    continue
+            else:
+                thresholds = job.get("thresholds", default_thresholds)
+            if not data_list or not thresholds:
+                yield {"asset_id": asset_id,
+                       "error": "Missing 'data_list' or 'thresholds' in request"}
+                continue
+            result = build_report(analyzer, data_list, thresholds, alias, **(options or {}))
+        except Exception:
+            yield {"asset_id": asset_id, "error": "Failed to analyze sensor data"}
+            continue
+        yield {"asset_id": asset_id, **result}
+
+def run_batch(jobs, analyzer, alias, default_thresholds=None, profiles=None, options=None):
+    return list(iter_batch(jobs, analyzer, alias, default_thresholds, profiles, options))
+
 def register_routes(app):
+    streams = StreamStore(QUAD_SCHEMA.keys, app.config["STREAM_WINDOW"], app.config["STREAM_MAX_ASSETS"])
+    profiles = ProfileRegistry(app.config["MAX_THRESHOLD_PROFILES"])
+
+    response_cache = ResponseCache(app.config["RESPONSE_CACHE_SIZE"], app.config["RESPONSE_CACHE_TTL"],
+                                   app.config["RESPONSE_CACHE_MAX_BODY"], app.config["RESPONSE_CACHE_MAX_BYTES"])
+    archive = SampleArchive(app.config["ARCHIVE_DIR"], QUAD_SCHEMA.keys) if app.config["ARCHIVE_DIR"] else None
+    rollups = RollupStore(archive, app.config["ROLLUP_RETENTION"]) if archive is not None else None
+
+    def wants_ndjson():
+        return request.accept_mimetypes.best_match(["application/json", NDJSON_TYPES[0]]) == NDJSON_TYPES[0]
+
+    def unknown_profile(profile_id):
+        return jsonify({"error": f"Unknown threshold profile '{profile_id}'"}), 404
+
+    def request_option(data, name):
+        # Analysis options come from the body or, for binary bodies, the query string
+        value = data.get(name) if isinstance(data, dict) else None
+        return request.args.get(name) if value is None else value
+
+    def analysis_options(data):
+        # Analyzer keyword arguments for this request; None for an unsupported precision
+        dtype = PRECISIONS.get(request_option(data, "precision") or app.config["COMPUTE_PRECISION"])
+        if dtype is None:
+            return None
+        options = {"dtype": dtype}
+        approximate = request_option(data, "approximate")
+        if approximate is None:
+            approximate = app.config["APPROXIMATE"]
+        if approximate in (True, "1", "true"):
+            options["rank_error"] = app.config["APPROXIMATE_RANK_ERROR"]
+            options["confidence"] = app.config["APPROXIMATE_CONFIDENCE"]
+        return options
+
+    def unsupported_precision():
+        return jsonify({"error": f"Unsupported precision; use one of {', '.join(PRECISIONS)}"}), 400
+
+    def cached(view):
+        # Serve repeated payloads from response_cache; only 200 responses are stored.
+        # NDJSON bodies are read incrementally by the view and NDJSON responses are
+        # streamed, so neither goes through the cache; nor do bodies without a
+        # Content-Length, which would have to be read in full to hash them.
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if (not response_cache.enabled or request.mimetype in NDJSON_TYPES or wants_ndjson()
+                    or request.content_length is None or request.content_length > response_cache.max_body):
+                return view(*args, **kwargs)
+            key = ResponseCache.key(request.path, request.query_string,
+                                    request.content_type, request.get_data(cache=True))
+            hit = response_cache.get(key)
+            if hit is not None:
+                body, mimetype = hit
+                response = app.response_class(body, status=200, mimetype=mimetype)
+                response.headers["X-Cache"] = "HIT"
+                return response
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                body = response.get_data()
+                if len(body) <= response_cache.max_body:
+                    response_cache.put(key, (body, response.mimetype), len(body))
+            response.headers["X-Cache"] = "MISS"
+            return response
+        return wrapper
+
     @app.route('/', methods=['GET'])
     def home():
         current_time = datetime.now(timezone.utc)
@@ -28,7 +142,22 @@ def register_routes(app):
             "uptime_seconds": uptime_seconds
         }), 200
 
+    def check_view(data_list, thresholds, schema, strict=False):
+        try:
+            groups = check_sensor_groups(data_list, thresholds, schema, strict)
+        except KeyError as e:
+            return jsonify({"error": f"Missing required field: {str(e)}"}), 400
+        except ZeroDivisionError:
+            return jsonify({"error": "Empty data list or missing sensor values"}), 400
+        except Exception as e:
+            return jsonify({"error": f"An error occurred while processing the request: {str(e)}"}), 500
+
+        result = {f"{group}_health": "healthy" if ok else "unhealthy" for group, ok in groups.items()}
+        result["overall_health"] = "Healthy" if all(groups.values()) else "Unhealthy"
+        return jsonify(result)
+
     @app.route('/check_health', methods=['POST'])
+    @cached
     def check_health():
         try:
             data = request.get_json()
@@ -36,112 +165,57 @@ def register_routes(app):
                 return jsonify({"error": "Invalid or missing JSON in request"}), 400
             
             data_list = data.get("data_list")
-            thresholds = data.get("thresholds")
+            thresholds, unknown = profiles.thresholds_for(data)
+            if unknown:
+                return unknown_profile(unknown)
 
             if data_list is None or thresholds is None:
                 return jsonify({"error": "Missing 'data_list' or 'thresholds' in request"}), 400
 
-            if not isinstance(data_list, list) or not data_list:
+            if is_columnar(data_list):
+                first = data_list
+            elif isinstance(data_list, list) and data_list:
+                first = data_list[0]
+            else:
                 return jsonify({"error": "Missing 'data_list' or 'thresholds' in request"}), 400
 
-            if not isinstance(data_list[0], dict) or "temperature_one" not in data_list[0]:
+            if not isinstance(first, dict) or "temperature_one" not in first:
                 return jsonify({"error": "Missing required field: 'temperature_one'"}), 400
 
-            health_status = {
-                "temperature_skin": [],
-                "temperature_bearing": [],
-                "vibration_x": [],
-                "vibration_y": [],
-                "vibration_z": []
-            }
-
-            try:
-                temperature_skin_values = [entry["temperature_one"] for entry in data_list]
-                temperature_bearing_values = [entry["temperature_two"] for entry in data_list]
-              
-                vibration_x_values = [entry["vibration_x"] for entry in data_list]
-                vibration_y_values = [entry["vibration_y"] for entry in data_list]
-                vibration_z_values = [entry["vibration_z"] for entry in data_list]
-                
-                if not all([temperature_skin_values, temperature_bearing_values,
-                           vibration_x_values, vibration_y_values, vibration_z_values]):
-                    return jsonify({"error": "Empty data list or missing sensor values"}), 400
-
-                mean_temperature_skin = sum(temperature_skin_values) / len(temperature_skin_values)
-                mean_temperature_bearing = sum(temperature_bearing_values) / len(temperature_bearing_values)
-                mean_vibration_x = sum(vibration_x_values) / len(vibration_x_values)
-                mean_vibration_y = sum(vibration_y_values) / len(vibration_y_values)
-                mean_vibration_z = sum(vibration_z_values) / len(vibration_z_values)
-
-                health_status["temperature_skin"].append(
-                    "healthy" if thresholds.get("temperature_skin_healthy", float('-inf')) <= mean_temperature_skin <= thresholds.get("temperature_skin_warning", float('inf'))
-                    else "unhealthy"
-                )
-                health_status["temperature_bearing"].append(
-                    "healthy" if thresholds.get("temperature_bearing_healthy", float('-inf')) <= mean_temperature_bearing <= thresholds.get("temperature_bearing_warning", float('inf'))
-                    else "unhealthy"
-                )
-                health_status["vibration_x"].append(
-                    "healthy" if thresholds.get("vibration_X_healthy", float('-inf')) <= mean_vibration_x <= thresholds.get("vibration_X_warning", float('inf'))
-                    else "unhealthy"
-                )
-                health_status["vibration_y"].append(
-                    "healthy" if thresholds.get("vibration_Y_healthy", float('-inf')) <= mean_vibration_y <= thresholds.get("vibration_Y_warning", float('inf'))
-                    else "unhealthy"
-                )
-                health_status["vibration_z"].append(
-                    "healthy" if thresholds.get("vibration_Z_healthy", float('-inf')) <= mean_vibration_z <= thresholds.get("vibration_Z_warning", float('inf'))
-                    else "unhealthy"
-                )
-                temperature_health = "healthy" if "unhealthy" not in health_status["temperature_skin"] + health_status["temperature_bearing"] else "unhealthy"
-                vibration_health = "healthy" if "unhealthy" not in health_status["vibration_x"] + health_status["vibration_y"] + health_status["vibration_z"] else "unhealthy"
-                overall_health = "Healthy" if temperature_health == "healthy" and vibration_health == "healthy" else "Unhealthy"
-                
-                return jsonify({
-                    "temperature_health": temperature_health,
-                    "vibration_health": vibration_health,
-                    "overall_health": overall_health
-                })
-                
-            except KeyError as e:
-                return jsonify({"error": f"Missing required field: {str(e)}"}), 400
-            except ZeroDivisionError:
-                return jsonify({"error": "Empty data list or missing sensor values"}), 400
-            except Exception as e:
-                return jsonify({"error": f"An error occurred while processing the request: {str(e)}"}), 500
-                
+            return check_view(data_list, thresholds, DUO_SCHEMA)
         except Exception as e:
             return jsonify({"error": "Invalid or missing JSON in request"}), 400
             
     @app.route('/analyze', methods=['POST'])
+    @cached
     def analyze():
         try:
-            data = request.get_json()
+            data = load_payload()
             if data is None:
                 return jsonify({"error": "Unsupported Media Type"}), 415
                 
             data_list = data.get("data_list", [])
-            thresholds = data.get("thresholds", {})
+            thresholds, unknown = profiles.thresholds_for(data, {})
+            if unknown:
+                return unknown_profile(unknown)
             
             if not data_list or not thresholds:
                 return jsonify({"error": "Missing 'data_list' or 'thresholds' in request"}), 500
+            options = analysis_options(data)
+            if options is None:
+                return unsupported_precision()
             
             try:
-                overall_status, possible_cause, details = analyze_sensor_data_duo(
-                    data_list, thresholds, field_alias_duo
-                )
-                overall_health = "Healthy" if overall_status == "MACHINE IS IN GOOD CONDITION" else "Unhealthy"
-                return jsonify({
-                    "overall_health": overall_health,
-                    "possible_cause": possible_cause,
-                    "details": details
-                })
+                return jsonify(build_report(
+                    analyze_sensor_data_duo, data_list, thresholds, field_alias_duo, **options
+                ))
             except Exception:
                 return jsonify({"error": "Failed to analyze sensor data"}), 500
         except Exception:
             return jsonify({"error": "Unsupported Media Type"}), 415
 
     @app.route('/check_health_quad', methods=['POST'])
+    @cached
     def check_health_quad():
         try:
             data = request.get_json()
@@ -149,142 +223,359 @@ def register_routes(app):
                 return jsonify({"error": "Invalid or missing JSON in request"}), 400
             
             data_list = data.get("data_list", [])
-            thresholds = data.get("thresholds", {})
+            thresholds, unknown = profiles.thresholds_for(data, {})
         except Exception:
             return jsonify({"error": "Invalid or missing JSON in request"}), 400
+        if unknown:
+            return unknown_profile(unknown)
         if not data_list or not thresholds:
             return jsonify({"error": "Missing 'data_list' or 'thresholds' in request"}), 400
-        health_status = {
-            "temperature_skin"   : [],
-            "temperature_bearing": [],
-            "vibration_x"        : [],
-            "vibration_y"        : [],
-            "vibration_z"        : [],
-            "magnetic_flux_x"    : [],
-            "magnetic_flux_y"    : [],
-            "magnetic_flux_z"    : [],
-            "ultrasound_one"     : [],
-            "ultrasound_two"     : []
-        }
-        t = thresholds
-        skin_vals     = [row["temperature_one"] for row in data_list]
-        bearing_vals  = [row["temperature_two"] for row in data_list]
-        mean_skin     = sum(skin_vals)    / len(skin_vals)
-        mean_bearing  = sum(bearing_vals) / len(bearing_vals)
-        health_status["temperature_skin"].append(
-            "healthy" if t["temperature_skin_healthy"] <= mean_skin <= t["temperature_skin_warning"]
-            else "unhealthy"
-        )
-        health_status["temperature_bearing"].append(
-            "healthy" if t["temperature_bearing_healthy"] <= mean_bearing <= t["temperature_bearing_warning"]
-            else "unhealthy"
-        )
-        vib_x_vals, vib_y_vals, vib_z_vals = [], [], []
-        for row in data_list:
-            vib_x_vals.append(row["vibration_x"])
-            vib_y_vals.append(row["vibration_y"])
-            vib_z_vals.append(row["vibration_z"])
-        mean_vx = sum(vib_x_vals) / len(vib_x_vals)
-        mean_vy = sum(vib_y_vals) / len(vib_y_vals)
-        mean_vz = sum(vib_z_vals) / len(vib_z_vals)
-        health_status["vibration_x"].append(
-            "healthy" if t["vibration_X_healthy"] <= mean_vx <= t["vibration_X_warning"]
-            else "unhealthy"
-        )
-        health_status["vibration_y"].append(
-            "healthy" if t["vibration_Y_healthy"] <= mean_vy <= t["vibration_Y_warning"]
-            else "unhealthy"
-        )
-        health_status["vibration_z"].append(
-            "healthy" if t["vibration_Z_healthy"] <= mean_vz <= t["vibration_Z_warning"]
-            else "unhealthy"
-        )
-        flux_x_vals, flux_y_vals, flux_z_vals = [], [], []
-        for row in data_list:
-            flux_x_vals.append(row["magnetic_flux_x"])
-            flux_y_vals.append(row["magnetic_flux_y"])
-            flux_z_vals.append(row["magnetic_flux_z"])
-        mean_fx = sum(flux_x_vals) / len(flux_x_vals)
-        mean_fy = sum(flux_y_vals) / len(flux_y_vals)
-        mean_fz = sum(flux_z_vals) / len(flux_z_vals)
-        health_status["magnetic_flux_x"].append(
-            "healthy" if t["magnetic_flux_X_healthy"] <= mean_fx <= t["magnetic_flux_X_warning"]
-            else "unhealthy"
-        )
-        health_status["magnetic_flux_y"].append(
-            "healthy" if t["magnetic_flux_Y_healthy"] <= mean_fy <= t["magnetic_flux_Y_warning"]
-            else "unhealthy"
-        )
-        health_status["magnetic_flux_z"].append(
-            "healthy" if t["magnetic_flux_Z_healthy"] <= mean_fz <= t["magnetic_flux_Z_warning"]
-            else "unhealthy"
-        )
-        us1_vals, us2_vals = [], []
-        for row in data_list:
-            us1_vals.append(row["ultrasound_one"])
-            us2_vals.append(row["ultrasound_two"])
-        mean_us1 = sum(us1_vals) / len(us1_vals)
-        mean_us2 = sum(us2_vals) / len(us2_vals)
-        health_status["ultrasound_one"].append(
-            "healthy" if t["ultrasound_one_healthy"] <= mean_us1 <= t["ultrasound_one_warning"]
-            else "unhealthy"
-        )
-        health_status["ultrasound_two"].append(
-            "healthy" if t["ultrasound_two_healthy"] <= mean_us2 <= t["ultrasound_two_warning"]
-            else "unhealthy"
-        )
-        temperature_health = (
-            "healthy" if "unhealthy" not in health_status["temperature_skin"] + health_status["temperature_bearing"]
-            else "unhealthy"
-        )
-        vibration_health = (
-            "healthy" if "unhealthy" not in health_status["vibration_x"] + health_status["vibration_y"] + health_status["vibration_z"]
-            else "unhealthy"
-        )
-        flux_health = (
-            "healthy" if "unhealthy" not in health_status["magnetic_flux_x"] + health_status["magnetic_flux_y"] + health_status["magnetic_flux_z"]
-            else "unhealthy"
-        )
-        ultrasound_health = (
-            "healthy" if "unhealthy" not in health_status["ultrasound_one"] + health_status["ultrasound_two"]
-            else "unhealthy"
-        )
-        overall_health = (
-            "Healthy" if all(h == "healthy" for h in [temperature_health, vibration_health, flux_health, ultrasound_health])
-            else "Unhealthy"
-        )
-        return jsonify({
-            "temperature_health": temperature_health,
-            "vibration_health" : vibration_health,
-            "magnetic_flux_health": flux_health,
-            "ultrasound_health" : ultrasound_health,
-            "overall_health"    : overall_health
-        })
+        return check_view(data_list, thresholds, QUAD_SCHEMA, strict=True)
 
     @app.route('/report', methods=['POST'])
+    @cached
     def report():
         try:
-            data = request.get_json()
+            data = load_payload()
             if data is None:
                 return jsonify({"error": "Unsupported Media Type"}), 415
 
             data_list = data.get("data_list", [])
-            thresholds = data.get("thresholds", {})
+            thresholds, unknown = profiles.thresholds_for(data, {})
+            if unknown:
+                return unknown_profile(unknown)
             if not data_list or not thresholds:
                 return jsonify({"error": "Missing 'data_list' or 'thresholds' in request"}), 500
+            options = analysis_options(data)
+            if options is None:
+                return unsupported_precision()
                 
             try:
-                overall_status, possible_cause, details = analyze_sensor_data_quad(
-                    data_list, thresholds, field_alias
-                )
-                overall_health = "Healthy" if overall_status == "MACHINE IS IN GOOD CONDITION" else "Unhealthy"
-                
-                return jsonify({
-                    "overall_health": overall_health,
-                    "possible_cause": possible_cause,
-                    "details": details
-                })
+                return jsonify(build_report(
+                    analyze_sensor_data_quad, data_list, thresholds, field_alias, **options
+                ))
+            except Exception:
+                return jsonify({"error": "Failed to analyze sensor data"}), 500
+        except Exception:
+            return jsonify({"error": "Unsupported Media Type"}), 415 
+
+    def batch_view(analyzer, alias):
+        try:
+            data = load_payload()
+        except Exception:
+            return jsonify({"error": "Unsupported Media Type"}), 415
+        if data is None:
+            return jsonify({"error": "Unsupported Media Type"}), 415
+
+        jobs = data.get("jobs") if isinstance(data, dict) else data
+        if not isinstance(jobs, list) or not jobs:
+            return jsonify({"error": "Missing 'jobs' in request"}), 400
+        if len(jobs) > app.config["MAX_BATCH_JOBS"]:
+            return jsonify({"error": f"Batch exceeds {app.config['MAX_BATCH_JOBS']} jobs"}), 413
+
+        default_thresholds = None
+        if isinstance(data, dict):
+            default_thresholds, unknown = profiles.thresholds_for(data)
+            if unknown:
+                return unknown_profile(unknown)
+        options = analysis_options(data)
+        if options is None:
+            return unsupported_precision()
+        if wants_ndjson():
+            # One line per asset, written as soon as that asset has been evaluated
+            def generate():
+                for result in iter_batch(jobs, analyzer, alias, default_thresholds, profiles, options):
+                    yield app.json.dumps(result) + "\n"
+            return app.response_class(stream_with_context(generate()), mimetype=NDJSON_TYPES[0])
+
+        results = run_batch(jobs, analyzer, alias, default_thresholds, profiles, options)
+        return jsonify({
+            "count": len(results),
+            "failed": sum(1 for r in results if "error" in r),
+            "results": results
+        })
+
+    @app.route('/analyze/batch', methods=['POST'])
+    @cached
+    def analyze_batch():
+        return batch_view(analyze_sensor_data_duo, field_alias_duo)
+
+    @app.route('/report/batch', methods=['POST'])
+    @cached
+    def report_batch():
+        return batch_view(analyze_sensor_data_quad, field_alias)
+
+
+    @app.route('/report/trend', methods=['POST'])
+    @cached
+    def report_trend():
+        try:
+            data = load_payload()
+        except Exception:
+            return jsonify({"error": "Unsupported Media Type"}), 415
+        if not isinstance(data, dict):
+            return jsonify({"error": "Unsupported Media Type"}), 415
+
+        data_list = data.get("data_list", [])
+        thresholds, unknown = profiles.thresholds_for(data, {})
+        if unknown:
+            return unknown_profile(unknown)
+        if not data_list or not thresholds:
+            return jsonify({"error": "Missing 'data_list' or 'thresholds' in request"}), 400
+        try:
+            bucket_seconds = float(request_option(data, "bucket_seconds"))
+        except (TypeError, ValueError):
+            bucket_seconds = 0
+        if not (bucket_seconds > 0 and math.isfinite(bucket_seconds)):
+            return jsonify({"error": "Missing or invalid 'bucket_seconds' in request"}), 400
+        options = analysis_options(data)
+        if options is None:
+            return unsupported_precision()
+
+        try:
+            buckets = trend_sensor_data(data_list, thresholds, field_alias, bucket_seconds,
+                                        dtype=options["dtype"], max_buckets=app.config["MAX_TREND_BUCKETS"])
+        except KeyError:
+            return jsonify({"error": "Missing required field: 'timestamp'"}), 400
+        except TooManyBuckets:
+            return jsonify({"error": f"Trend exceeds {app.config['MAX_TREND_BUCKETS']} buckets"}), 413
+        except ValueError as e:  # e.g. a timestamp column of another length than the sensors
+            return jsonify({"error": f"Invalid 'data_list': {e}"}), 400
+        except Exception:
+            return jsonify({"error": "Failed to analyze sensor data"}), 500
+        return jsonify({"bucket_seconds": bucket_seconds, "buckets": buckets})
+
+    @app.route('/report/stream', methods=['POST'])
+    def report_stream():
+        try:
+            data = load_payload()
+        except Exception:
+            return jsonify({"error": "Unsupported Media Type"}), 415
+        if not isinstance(data, dict):
+            return jsonify({"error": "Unsupported Media Type"}), 415
+
+        asset_id = data.get("asset_id")
+        data_list = data.get("data_list", [])
+        thresholds, unknown = profiles.thresholds_for(data, {})
+        if unknown:
+            return unknown_profile(unknown)
+        if asset_id is None:
+            return jsonify({"error": "Missing 'asset_id' in request"}), 400
+        if isinstance(asset_id, bool) or not isinstance(asset_id, (str, int)):
+            return jsonify({"error": "Invalid 'asset_id' in request; use a string or integer"}), 400
+        if not thresholds:
+            return jsonify({"error": "Missing 'data_list' or 'thresholds' in request"}), 400
+
+        stream = streams.get(str(asset_id))  # the same stream as DELETE /report/stream/<asset_id>
+        try:
+            with stream.lock:
+                if data_list:
+                    stream.update(data_list)
+                averages = stream.averages()
+                samples = stream.samples()
+        except Exception:
+            return jsonify({"error": "Failed to analyze sensor data"}), 500
+        if samples == 0:
+            return jsonify({"error": "No samples received for this asset"}), 400
+
+        details = evaluate_bands(averages, thresholds, QUAD_SCHEMA)
+        overall_status, possible_cause = summarize(details)
+        overall_health = "Healthy" if overall_status == "MACHINE IS IN GOOD CONDITION" else "Unhealthy"
+        return jsonify({
+            "asset_id": asset_id,
+            "window_samples": samples,
+            "overall_health": overall_health,
+            "possible_cause": possible_cause,
+            "details": details
+        })
+
+    @app.route('/report/stream/<asset_id>', methods=['DELETE'])
+    def reset_stream(asset_id):
+        if not streams.drop(asset_id):
+            return jsonify({"error": "Unknown asset"}), 404
+        return jsonify({"asset_id": asset_id, "status": "reset"})
+
+
+    if archive is not None:
+        def archive_range(data):
+            # (start, end) epoch seconds, either may be None; None if malformed
+            try:
+                return tuple(None if value is None else float(value)
+                             for value in (request_option(data, "start"), request_option(data, "end")))
+            except (TypeError, ValueError):
+                return None
+
+        def archive_bands(thresholds):
+            # (low, high) of a thresholds dict or profile; None if malformed
+            if not isinstance(thresholds, (dict, ThresholdProfile)):
+                return None
+            try:
+                return QUAD_SCHEMA.bands(thresholds)
+            except (TypeError, ValueError):
+                return None
+
+        @app.route('/archive/<asset_id>', methods=['POST'])
+        def archive_samples(asset_id):
+            try:
+                data = load_payload()
+            except Exception:
+                return jsonify({"error": "Unsupported Media Type"}), 415
+            data_list = data.get("data_list") if isinstance(data, dict) else None
+            if not data_list:
+                return jsonify({"error": "Missing 'data_list' in request"}), 400
+            try:
+                window = SensorWindow.from_data(data_list, QUAD_SCHEMA.keys, required=False,
+                                                timestamp_key=TIMESTAMP_KEY)
+                samples = archive.append(asset_id, window)
+            except ValueError as e:  # e.g. an infinite or far-future timestamp
+                return jsonify({"error": f"Invalid 'data_list': {e}"}), 400
+            except Exception:
+                return jsonify({"error": "Failed to archive sensor data"}), 500
+            try:
+                rollups.refresh(asset_id)
+            except Exception:
+                return jsonify({"error": "Failed to archive sensor data"}), 500
+            return jsonify({"asset_id": asset_id, "appended": len(window), "samples": samples}), 201
+
+        @app.route('/archive/<asset_id>/report', methods=['POST'])
+        def archive_report(asset_id):
+            try:
+                data = request.get_json()
+            except Exception:
+                return jsonify({"error": "Invalid or missing JSON in request"}), 400
+            thresholds, unknown = profiles.thresholds_for(data if isinstance(data, dict) else {}, {})
+            if unknown:
+                return unknown_profile(unknown)
+            if not thresholds:
+                return jsonify({"error": "Missing 'thresholds' in request"}), 400
+            bands = archive_bands(thresholds)
+            if bands is None:
+                return jsonify({"error": "Invalid 'thresholds' in request"}), 400
+            time_range = archive_range(data)
+            if time_range is None:
+                return jsonify({"error": "Invalid 'start' or 'end' in request"}), 400
+            options = analysis_options(data)
+            if options is None:
+                return unsupported_precision()
+
+            try:
+                window = archive.read(asset_id, *time_range)
+                if window is None:
+                    return jsonify({"error": "Unknown asset"}), 404
+                if len(window) == 0:
+                    return jsonify({"error": "No samples in the requested range"}), 400
+                result = build_report(analyze_sensor_data_quad, window, thresholds, field_alias, **options)
             except Exception:
                 return jsonify({"error": "Failed to analyze sensor data"}), 500
+            return jsonify({"asset_id": asset_id, "window_samples": len(window), **result})
+
+        @app.route('/archive/<asset_id>/violations', methods=['POST'])
+        def archive_violations(asset_id):
+            try:
+                data = request.get_json()
+            except Exception:
+                return jsonify({"error": "Invalid or missing JSON in request"}), 400
+            thresholds, unknown = profiles.thresholds_for(data if isinstance(data, dict) else {}, {})
+            if unknown:
+                return unknown_profile(unknown)
+            if not thresholds:
+                return jsonify({"error": "Missing 'thresholds' in request"}), 400
+            bands = archive_bands(thresholds)
+            if bands is None:
+                return jsonify({"error": "Invalid 'thresholds' in request"}), 400
+            time_range = archive_range(data)
+            if time_range is None:
+                return jsonify({"error": "Invalid 'start' or 'end' in request"}), 400
+            try:
+                limit = int(request_option(data, "limit") or 1000)
+            except (TypeError, ValueError):
+                return jsonify({"error": "Invalid 'limit' in request"}), 400
+
+            try:
+                result = archive.violations(asset_id, *bands, *time_range, limit=limit)
+            except Exception:
+                return jsonify({"error": "Failed to analyze sensor data"}), 500
+            if result is None:
+                return jsonify({"error": "Unknown asset"}), 404
+            return jsonify({"asset_id": asset_id, **result})
+
+        @app.route('/archive/<asset_id>/summary', methods=['POST'])
+        def archive_summary(asset_id):
+            try:
+                data = request.get_json()
+            except Exception:
+                return jsonify({"error": "Invalid or missing JSON in request"}), 400
+            thresholds, unknown = profiles.thresholds_for(data if isinstance(data, dict) else {}, {})
+            if unknown:
+                return unknown_profile(unknown)
+            if not thresholds:
+                return jsonify({"error": "Missing 'thresholds' in request"}), 400
+            bands = archive_bands(thresholds)
+            if bands is None:
+                return jsonify({"error": "Invalid 'thresholds' in request"}), 400
+            time_range = archive_range(data)
+            if time_range is None:
+                return jsonify({"error": "Invalid 'start' or 'end' in request"}), 400
+            granularity = request_option(data, "granularity") or "hour"
+            if granularity not in GRANULARITIES:
+                return jsonify({"error": f"Unsupported granularity; use one of {', '.join(GRANULARITIES)}"}), 400
+
+            try:
+                summary = rollups.summary(asset_id, granularity, *time_range)
+            except Exception:
+                return jsonify({"error": "Failed to analyze sensor data"}), 500
+            if summary is None:
+                return jsonify({"error": "Unknown asset"}), 404
+            start, end, rollup = summary
+            if start is None:
+                return jsonify({"error": "No samples in the requested range"}), 400
+            details = evaluate_bands(rollup.robust_means(), thresholds, QUAD_SCHEMA,
+                                     approximation={"relative_accuracy": SKETCH_ACCURACY})
+            overall_status, possible_cause = summarize(details)
+            overall_health = "Healthy" if overall_status == "MACHINE IS IN GOOD CONDITION" else "Unhealthy"
+            return jsonify({
+                "asset_id": asset_id,
+                "granularity": granularity,
+                "start": start,
+                "end": end,
+                "window_samples": int(rollup.count.max()),
+                "overall_health": overall_health,
+                "possible_cause": possible_cause,
+                "details": details,
+                "sensors": rollup.stats(QUAD_SCHEMA.keys)
+            })
+
+        @app.route('/archive/<asset_id>', methods=['DELETE'])
+        def drop_archive(asset_id):
+            rollups.drop(asset_id)
+            if not archive.drop(asset_id):
+                return jsonify({"error": "Unknown asset"}), 404
+            return jsonify({"asset_id": asset_id, "status": "deleted"})
+
+
+    @app.route('/profiles', methods=['POST'])
+    def create_profile():
+        try:
+            data = request.get_json()
         except Exception:
-            return jsonify({"error": "Unsupported Media Type"}), 415 
\ No newline at end of file
+            return jsonify({"error": "Invalid or missing JSON in request"}), 400
+        thresholds = data.get("thresholds") if isinstance(data, dict) else None
+        if not isinstance(thresholds, dict) or not thresholds:
+            return jsonify({"error": "Missing 'thresholds' in request"}), 400
+        error = threshold_error(thresholds)
+        if error is not None:
+            return jsonify({"error": error}), 400
+        profile = profiles.put(thresholds)
+        return jsonify({"profile_id": profile.profile_id}), 201
+
+    @app.route('/profiles/<profile_id>', methods=['GET'])
+    def get_profile(profile_id):
+        profile = profiles.get(profile_id)
+        if profile is None:
+            return unknown_profile(profile_id)
+        return jsonify({"profile_id": profile.profile_id, "thresholds": profile.thresholds})
+
+
+    @app.route('/cache/stats', methods=['GET'])
+    def cache_stats():
+        return jsonify(response_cache.stats())
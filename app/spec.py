@@ -0,0 +1,73 @@
+import copy
+import json
+import os
+
+from flask import current_app
+
+SWAGGER_FILE = os.path.join(os.path.abspath(os.path.dirname(os.path.dirname(__file__))), 'swagger', 'swagger.yaml')
+
+SWAGGER_CONFIG = {
+    "headers": [],
+    "specs": [
+        {
+            "endpoint": 'apispec',
+            "route": '/apispec.json',
+            "rule_filter": lambda rule: True,
+            "model_filter": lambda tag: True,
+        }
+    ],
+    "static_url_path": "/flasgger_static",
+    "swagger_ui": True,
+    "specs_route": "/apidocs/",
+    "title": "Asset Health Prediction API",
+    "description": "API for predicting asset health using various sensors",
+    "termsOfService": "",
+    "uiversion": 2
+}
+
+# (path, mtime) -> parsed spec, so create_app() parses swagger.yaml once per process
+_specs = {}
+
+
+def load_spec(path: str = SWAGGER_FILE, cache_path: str = None) -> dict:
+    """The OpenAPI spec in ``path`` as a dict; callers must not modify it.
+
+    With ``cache_path`` set, the parsed spec is also written there as JSON
+    and new processes read that copy instead while it is newer than the
+    YAML, so they skip YAML parsing entirely.
+    """
+    mtime = os.path.getmtime(path)
+    cached = bool(cache_path) and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= mtime
+    spec = _specs.get((path, mtime))
+    if spec is None:
+        if cached:
+            with open(cache_path, "rb") as f:
+                spec = json.load(f)
+        else:
+            import yaml
+            with open(path, "rb") as f:
+                spec = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+        _specs[(path, mtime)] = spec
+    if cache_path and not cached:
+        partial = f"{cache_path}.{os.getpid()}.tmp"
+        with open(partial, "w") as f:
+            json.dump(spec, f)
+        os.replace(partial, cache_path)
+    return spec
+
+
+def register_swagger(app):
+    """Serve the spec at /apispec.json, with the flasgger UI at /apidocs/ when ``SWAGGER_UI`` is set.
+
+    Without the UI, flasgger (and jsonschema and mistune with it) is never
+    imported, and the spec is only loaded on the first /apispec.json request.
+    """
+    if app.config["SWAGGER_UI"]:
+        from flasgger import Swagger
+        spec = load_spec(SWAGGER_FILE, app.config["SWAGGER_SPEC_CACHE"])
+        Swagger(app, template=copy.deepcopy(spec), config=SWAGGER_CONFIG)
+        return
+
+    @app.route('/apispec.json', methods=['GET'])
+    def apispec():
+        return current_app.json.response(load_spec(SWAGGER_FILE, current_app.config["SWAGGER_SPEC_CACHE"]))
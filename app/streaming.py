@@ -0,0 +1,235 @@
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from app.health_utils import extract_column
+
+
+# Values per block are kept between 1 and 2 * _LOAD
+_LOAD = 128
+# Every finite double is a whole multiple of 2**-1074, so sums of readings
+# scaled by this are exact Python ints
+_SCALE = 1 << 1074
+
+
+def _fixed(value: float) -> int:
+    # value * _SCALE, exactly
+    numerator, denominator = value.as_integer_ratio()
+    return numerator << (1075 - denominator.bit_length())
+
+
+def _fenwick(values) -> list:
+    # Fenwick (binary indexed) tree over `values`, 1-based
+    tree = [0] + list(values)
+    for i in range(1, len(tree)):
+        parent = i + (i & -i)
+        if parent < len(tree):
+            tree[parent] += tree[i]
+    return tree
+
+
+def _fenwick_add(counts: list, totals: list, i: int, count: int, total: int):
+    # Add to value `i` of two trees over the same blocks
+    i += 1
+    size = len(counts)
+    while i < size:
+        counts[i] += count
+        totals[i] += total
+        i += i & -i
+
+
+def _fenwick_prefix(tree: list, i: int):
+    # Sum of the first `i` values
+    total = 0
+    while i > 0:
+        total += tree[i]
+        i -= i & -i
+    return total
+
+
+def _fenwick_search(tree: list, k: int):
+    # (i, k - prefix(i)) for the i with prefix(i) <= k < prefix(i + 1)
+    pos, step = 0, 1 << (len(tree) - 1).bit_length()
+    while step:
+        if pos + step < len(tree) and tree[pos + step] <= k:
+            pos += step
+            k -= tree[pos]
+        step >>= 1
+    return pos, k
+
+
+class RollingSensor:
+    """Sliding window of one sensor's readings, kept as a blocked sorted list.
+
+    The sorted values are split into blocks of up to 2 * _LOAD, and
+    Fenwick trees over the blocks hold their counts and sums. A push
+    inserts into one block and removes from one, updating O(log blocks)
+    tree nodes, so its cost does not grow with the window; the trees are
+    rebuilt only when a block splits or empties. Median, MAD and the
+    trimmed sum are read by rank through the trees. Sums are kept as exact
+    integers (see _fixed), so however long the stream runs no total drifts,
+    and the trimmed mean is correctly rounded up to the final division.
+    Non-finite readings are ignored.
+    """
+    __slots__ = ("window", "blocks", "maxes", "sums", "counts", "totals")
+
+    def __init__(self, size: int):
+        self.window = deque(maxlen=size)
+        self.blocks = []
+        self.maxes = []  # last (largest) value of each block
+        self.sums = []
+        self._rebuild()
+
+    def push(self, value: float):
+        if not math.isfinite(value):
+            return
+        if len(self.window) == self.window.maxlen:
+            self._remove(self.window[0])
+        self.window.append(value)
+        self._insert(value)
+
+    def __len__(self):
+        return len(self.window)
+
+    def _rebuild(self):
+        self.counts = _fenwick(len(block) for block in self.blocks)
+        self.totals = _fenwick(self.sums)
+
+    def _insert(self, value: float):
+        blocks = self.blocks
+        if not blocks:
+            self.blocks, self.maxes, self.sums = [[value]], [value], [_fixed(value)]
+            return self._rebuild()
+        i = min(bisect_left(self.maxes, value), len(blocks) - 1)
+        block = blocks[i]
+        insort(block, value)
+        self.maxes[i] = block[-1]
+        if len(block) > 2 * _LOAD:
+            blocks[i:i + 1] = block[:_LOAD], block[_LOAD:]
+            self.maxes[i:i + 1] = blocks[i][-1], blocks[i + 1][-1]
+            low = sum(map(_fixed, blocks[i]))
+            self.sums[i:i + 1] = low, self.sums[i] + _fixed(value) - low
+            return self._rebuild()
+        fixed = _fixed(value)
+        self.sums[i] += fixed
+        _fenwick_add(self.counts, self.totals, i, 1, fixed)
+
+    def _remove(self, value: float):
+        i = bisect_left(self.maxes, value)
+        block = self.blocks[i]
+        del block[bisect_left(block, value)]
+        if not block:
+            del self.blocks[i], self.maxes[i], self.sums[i]
+            return self._rebuild()
+        fixed = _fixed(value)
+        self.maxes[i] = block[-1]
+        self.sums[i] -= fixed
+        _fenwick_add(self.counts, self.totals, i, -1, -fixed)
+
+    def _at(self, rank: int) -> float:
+        i, j = _fenwick_search(self.counts, rank)
+        return self.blocks[i][j]
+
+    def _rank(self, value: float, side=bisect_left) -> int:
+        # Number of values below `value`, or not above it with bisect_right
+        i = side(self.maxes, value)
+        if i == len(self.blocks):
+            return len(self.window)
+        return _fenwick_prefix(self.counts, i) + side(self.blocks[i], value)
+
+    def _sum(self, lo: int, hi: int) -> float:
+        # Sum of the values ranked lo to hi - 1
+        i, a = _fenwick_search(self.counts, lo)
+        j, b = _fenwick_search(self.counts, hi) if hi < len(self.window) else (len(self.blocks), 0)
+        if i == j:
+            return math.fsum(self.blocks[i][a:b])
+        # int / int is correctly rounded, so the whole blocks add one rounding
+        middle = (_fenwick_prefix(self.totals, j) - _fenwick_prefix(self.totals, i + 1)) / _SCALE
+        tail = self.blocks[j][:b] if j < len(self.blocks) else []
+        return math.fsum([*self.blocks[i][a:], middle, *tail])
+
+    def _deviation(self, med: float, split: int, k: int) -> float:
+        # k-th smallest |x - med| as a merge of two sorted runs: values below
+        # the median read right-to-left and values above it read left-to-right.
+        n_left, n_right = split, len(self.window) - split
+        left = lambda j: med - self._at(split - 1 - j)
+        right = lambda j: self._at(split + j) - med
+        lo, hi = max(0, k + 1 - n_right), min(k + 1, n_left)
+        while True:
+            i = (lo + hi) // 2
+            j = k + 1 - i
+            if i < n_left and j > 0 and right(j - 1) > left(i):
+                lo = i + 1
+            elif i > 0 and j < n_right and left(i - 1) > right(j):
+                hi = i - 1
+            else:
+                candidates = []
+                if i > 0:
+                    candidates.append(left(i - 1))
+                if j > 0:
+                    candidates.append(right(j - 1))
+                return max(candidates)
+
+    def robust_mean(self, k_outlier: float = 3.5, max_frac: float = 0.05) -> float:
+        n = len(self.window)
+        if n == 0:
+            return np.nan
+        med = (self._at((n - 1) // 2) + self._at(n // 2)) / 2
+        split = self._rank(med)
+        mad = (self._deviation(med, split, (n - 1) // 2) + self._deviation(med, split, n // 2)) / 2
+        if mad == 0:
+            return float(med)
+        cut = k_outlier * 1.4826 * mad
+        n_low = self._rank(med - cut)
+        n_high = n - self._rank(med + cut, bisect_right)
+        if (n_low + n_high) / n <= max_frac:
+            return self._sum(n_low, n - n_high) / (n - n_low - n_high)
+        return self._sum(0, n) / n
+
+
+class AssetStream:
+    __slots__ = ("sensors", "lock")
+
+    def __init__(self, keys, size: int):
+        self.sensors = {key: RollingSensor(size) for key in keys}
+        self.lock = threading.Lock()
+
+    def update(self, data_list):
+        for key, sensor in self.sensors.items():
+            for value in extract_column(data_list, key, required=False).tolist():
+                sensor.push(value)
+
+    def averages(self, k_outlier: float = 3.5, max_frac: float = 0.05) -> np.ndarray:
+        return np.array([s.robust_mean(k_outlier, max_frac) for s in self.sensors.values()])
+
+    def samples(self) -> int:
+        return max((len(s) for s in self.sensors.values()), default=0)
+
+
+class StreamStore:
+    """Per-asset rolling windows, evicting the least recently updated asset."""
+
+    def __init__(self, keys, window: int, max_assets: int):
+        self.keys = list(keys)
+        self.window = window
+        self.max_assets = max_assets
+        self.assets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, asset_id) -> AssetStream:
+        with self.lock:
+            stream = self.assets.get(asset_id)
+            if stream is None:
+                stream = self.assets[asset_id] = AssetStream(self.keys, self.window)
+                while len(self.assets) > self.max_assets:
+                    self.assets.popitem(last=False)
+            else:
+                self.assets.move_to_end(asset_id)
+            return stream
+
+    def drop(self, asset_id) -> bool:
+        with self.lock:
+            return self.assets.pop(asset_id, None) is not None
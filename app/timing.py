@@ -0,0 +1,40 @@
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+_local = threading.local()
+
+
+def start_timing() -> dict:
+    """Begin collecting stage timings for the current thread's request."""
+    _local.timings = {}
+    _local.active = set()
+    return _local.timings
+
+
+def current_timings():
+    """Timings dict of the request being measured on this thread, if any."""
+    return getattr(_local, "timings", None)
+
+
+def stop_timing() -> dict:
+    timings = getattr(_local, "timings", None)
+    _local.timings = None
+    return timings or {}
+
+
+@contextmanager
+def stage(name: str):
+    # Accumulates wall time per stage name; nested use of the same name (e.g.
+    # load_payload calling into the JSON decoder) is only counted once.
+    timings = getattr(_local, "timings", None)
+    if timings is None or name in _local.active:
+        yield
+        return
+    _local.active.add(name)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + perf_counter() - started
+        _local.active.discard(name)
@@ -0,0 +1,229 @@
+"""Micro- and macro-benchmarks for the analysis engine and the HTTP endpoints.
+
+Examples:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --suite engine
+    python benchmarks/run_benchmarks.py --output new.json --compare old.json
+    python benchmarks/run_benchmarks.py --suite startup
+
+Every case is timed with a fixed random seed, so runs on different commits can
+be compared case by case. Engine cases call ``app.health_utils`` directly, and
+route cases go through the Flask test client with the response cache
+disabled, and startup cases time a cold import and ``create_app()``.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.health_utils import (
+    adaptive_mean, robust_means, analyze_sensor_data_duo, analyze_sensor_data_quad,
+    field_alias, field_alias_duo, SENSOR_SCHEMA
+)
+
+DEFAULT_SIZES = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+BASE_THRESHOLDS = {
+    "temperature_skin": (30, 50), "temperature_bearing": (35, 55),
+    "vibration_X": (0.1, 0.5), "vibration_Y": (0.1, 0.5), "vibration_Z": (0.1, 0.5),
+    "magnetic_flux_X": (0.1, 0.6), "magnetic_flux_Y": (0.1, 0.6), "magnetic_flux_Z": (0.1, 0.6),
+    "ultrasound_one": (40, 60), "ultrasound_two": (40, 60),
+}
+
+
+def make_thresholds():
+    thresholds = {}
+    for base, (low, high) in BASE_THRESHOLDS.items():
+        thresholds[f"{base}_healthy"] = low
+        thresholds[f"{base}_warning"] = high
+    return thresholds
+
+
+def make_matrix(n_samples, n_sensors, outlier_ratio, nan_ratio, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.array([np.mean(band) for band in BASE_THRESHOLDS.values()])
+    centers = np.resize(centers, n_sensors)
+    matrix = rng.normal(centers, np.abs(centers) * 0.05 + 0.01, size=(n_samples, n_sensors))
+    matrix[rng.random(matrix.shape) < outlier_ratio] *= 20
+    matrix[rng.random(matrix.shape) < nan_ratio] = np.nan
+    return np.asfortranarray(matrix)
+
+
+def as_columns(matrix, keys):
+    return {key: matrix[:, i].tolist() for i, key in enumerate(keys)}
+
+
+def as_rows(matrix, keys):
+    return [dict(zip(keys, row)) for row in matrix.tolist()]
+
+
+def time_call(fn, min_time, max_repeats):
+    # Repeat until min_time has elapsed (at least 3 runs) and report the spread
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_repeats:
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+        if len(timings) >= 3 and time.perf_counter() - started >= min_time:
+            break
+    return {
+        "repeats": len(timings),
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+    }
+
+
+def engine_cases(sizes, sensor_counts, outlier_ratios, nan_ratio):
+    keys = list(field_alias)
+    duo_keys = list(field_alias_duo)
+    thresholds = make_thresholds()
+    for n in sizes:
+        for outliers in outlier_ratios:
+            params = {"samples": n, "outlier_ratio": outliers}
+            matrix = make_matrix(n, len(keys), outliers, nan_ratio)
+            column = np.ascontiguousarray(matrix[:, 0])
+            yield "adaptive_mean", params, lambda c=column: adaptive_mean(c[~np.isnan(c)])
+            for n_sensors in sensor_counts:
+                wide = make_matrix(n, n_sensors, outliers, nan_ratio)
+                yield "robust_means", dict(params, sensors=n_sensors), lambda m=wide: robust_means(m)
+            columns = as_columns(matrix, keys)
+            yield ("analyze_quad_columnar", params,
+                   lambda d=columns: analyze_sensor_data_quad(d, thresholds, field_alias))
+            duo_columns = {k: np.nan_to_num(np.asarray(columns[k])).tolist() for k in duo_keys}
+            yield ("analyze_duo_columnar", params,
+                   lambda d=duo_columns: analyze_sensor_data_duo(d, thresholds, field_alias_duo))
+            if n <= 100_000:
+                rows = as_rows(matrix, keys)
+                yield ("analyze_quad_rows", params,
+                       lambda d=rows: analyze_sensor_data_quad(d, thresholds, field_alias))
+
+
+def route_cases(sizes, outlier_ratios, max_route_samples):
+    from app.factory import create_app
+    app = create_app({"TESTING": True, "RESPONSE_CACHE_SIZE": 0, "OFFLOAD_MIN_SAMPLES": 0})
+    client = app.test_client()
+    keys = [key for key, _, _ in SENSOR_SCHEMA]
+    duo_keys = list(field_alias_duo)
+    thresholds = make_thresholds()
+    for n in sizes:
+        if n > max_route_samples:
+            continue
+        for outliers in outlier_ratios:
+            params = {"samples": n, "outlier_ratio": outliers}
+            matrix = make_matrix(n, len(keys), outliers, 0.0)
+            rows = as_rows(matrix, keys)
+            quad_body = json.dumps({"data_list": rows, "thresholds": thresholds})
+            duo_body = json.dumps({"data_list": [{k: r[k] for k in duo_keys} for r in rows],
+                                   "thresholds": thresholds})
+            columnar_body = json.dumps({"data_list": as_columns(matrix, keys), "thresholds": thresholds})
+            for path, body in [('/check_health', duo_body), ('/analyze', duo_body),
+                               ('/check_health_quad', quad_body), ('/report', quad_body),
+                               ('/report#columnar', columnar_body)]:
+                url = path.split('#')[0]
+
+                def call(url=url, body=body):
+                    response = client.post(url, data=body, content_type='application/json')
+                    assert response.status_code == 200, response.get_data()[:200]
+
+                yield f"POST {path}", dict(params, body_bytes=len(body)), call
+            batch_body = json.dumps({"thresholds": thresholds, "jobs": [
+                {"asset_id": f"asset-{i}", "data_list": rows[:max(1, n // 100)]} for i in range(100)
+            ]})
+            yield ("POST /report/batch", dict(params, jobs=100, body_bytes=len(batch_body)),
+                   lambda b=batch_body: client.post('/report/batch', data=b, content_type='application/json'))
+
+
+def startup_cases():
+    # Cold import in a fresh interpreter, then app construction in this one
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    for module in ["app.factory"]:
+        yield (f"import {module}", {"cold": True},
+               lambda m=module: subprocess.run([sys.executable, "-c", f"import {m}"], cwd=root, check=True))
+    from app.factory import create_app
+    for swagger_ui in (True, False):
+        config = {"TESTING": True, "SWAGGER_UI": swagger_ui}
+        yield "create_app", {"swagger_ui": swagger_ui}, lambda c=config: create_app(c)
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def case_key(result):
+    return json.dumps([result["name"], result["params"]], sort_keys=True)
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {case_key(r): r for r in json.load(f)["results"]}
+    print(f"\n{'case':70} {'before':>10} {'after':>10} {'ratio':>7}")
+    for result in results:
+        old = baseline.get(case_key(result))
+        if old is None:
+            continue
+        before, after = old["median_s"], result["median_s"]
+        label = f"{result['name']} {result['params']}"
+        print(f"{label[:70]:70} {before * 1e3:9.3f}ms {after * 1e3:9.3f}ms {after / before:6.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", choices=["all", "engine", "routes", "startup"], default="all")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--sensors", type=int, nargs="+", default=[10])
+    parser.add_argument("--outlier-ratios", type=float, nargs="+", default=[0.0, 0.02])
+    parser.add_argument("--nan-ratio", type=float, default=0.01)
+    parser.add_argument("--max-route-samples", type=int, default=100_000,
+                        help="skip route cases above this window size (JSON encoding dominates)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to spend per case")
+    parser.add_argument("--max-repeats", type=int, default=1000)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="print ratios against a previous JSON result file")
+    args = parser.parse_args(argv)
+
+    cases = []
+    if args.suite in ("all", "engine"):
+        cases.append(engine_cases(args.sizes, args.sensors, args.outlier_ratios, args.nan_ratio))
+    if args.suite in ("all", "routes"):
+        cases.append(route_cases(args.sizes, args.outlier_ratios, args.max_route_samples))
+    if args.suite in ("all", "startup"):
+        cases.append(startup_cases())
+
+    results = []
+    for generator in cases:
+        for name, params, fn in generator:
+            timing = time_call(fn, args.min_time, args.max_repeats)
+            results.append({"name": name, "params": params, **timing})
+            print(f"{name:28} {json.dumps(params):70} {timing['median_s'] * 1e3:10.3f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+
+# With PROMETHEUS_MULTIPROC_DIR set, each worker writes its metrics to that
+# directory and /metrics aggregates them; dead workers must be marked so
+# their live gauges are dropped.
+if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    def child_exit(server, worker):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,8 @@
-from locust import HttpUser, task, between
+from locust import HttpUser, task, between, events
+import json
 import logging
+import math
+import random
 
 class HealthCheckUser(HttpUser):
     wait_time = between(1, 2)
@@ -150,3 +153,188 @@ class HealthCheckUser(HttpUser):
                 response.success()
             else:
                 response.failure(f"Unexpected status code: {response.status_code}")
+
+
+
+SENSORS = {
+    # data_list key: (threshold base, typical value, spread)
+    "temperature_one": ("temperature_skin", 40, 3),
+    "temperature_two": ("temperature_bearing", 45, 3),
+    "vibration_x": ("vibration_X", 0.3, 0.05),
+    "vibration_y": ("vibration_Y", 0.3, 0.05),
+    "vibration_z": ("vibration_Z", 0.3, 0.05),
+    "magnetic_flux_x": ("magnetic_flux_X", 0.35, 0.05),
+    "magnetic_flux_y": ("magnetic_flux_Y", 0.35, 0.05),
+    "magnetic_flux_z": ("magnetic_flux_Z", 0.35, 0.05),
+    "ultrasound_one": ("ultrasound_one", 50, 4),
+    "ultrasound_two": ("ultrasound_two", 50, 4),
+}
+DUO_SENSORS = ["temperature_one", "temperature_two", "vibration_x", "vibration_y", "vibration_z"]
+THRESHOLDS = {}
+for _key, (_base, _center, _spread) in SENSORS.items():
+    THRESHOLDS[f"{_base}_healthy"] = round(_center - 4 * _spread, 3)
+    THRESHOLDS[f"{_base}_warning"] = round(_center + 4 * _spread, 3)
+
+
+def sensor_window(n_samples, keys=SENSORS, outlier_ratio=0.0, gap_ratio=0.0, columnar=False, rng=random):
+    """Synthetic window; outliers are 10x spikes and gaps are missing readings."""
+    def reading(key):
+        _, center, spread = SENSORS[key]
+        value = rng.gauss(center, spread)
+        if rng.random() < outlier_ratio:
+            value *= 10
+        return round(value, 4)
+
+    if columnar:
+        return {key: [None if rng.random() < gap_ratio else reading(key) for _ in range(n_samples)]
+                for key in keys}
+    rows = []
+    for _ in range(n_samples):
+        rows.append({key: reading(key) for key in keys if not rng.random() < gap_ratio})
+    return rows
+
+
+def log_uniform_size(low, high, rng=random):
+    return int(math.exp(rng.uniform(math.log(low), math.log(high))))
+
+
+def check_report(response, sensors=SENSORS):
+    if response.status_code != 200:
+        response.failure(f"Unexpected status code: {response.status_code}")
+        return
+    data = response.json()
+    if all(key in data for key in ["overall_health", "possible_cause", "details"]) \
+            and all(sensor in data["details"] for sensor in sensors):
+        response.success()
+    else:
+        response.failure("Missing required fields in response")
+
+
+class GatewayBurstUser(HttpUser):
+    """Edge gateway flushing a 1k-100k sample window in a burst, then idling."""
+    wait_time = between(0.5, 3)
+    host = "http://localhost:5000"
+    body_variants = 6
+    bodies = []
+
+    def on_start(self):
+        # Windows are serialized once per process and shared by every gateway user,
+        # so generating them does not skew the client-side timings. Sizes are spaced
+        # log-evenly from 1k to 100k samples so every decade is exercised.
+        if not GatewayBurstUser.bodies:
+            rng = random.Random(42)
+            for i in range(self.body_variants):
+                n = round(1_000 * 100 ** (i / (self.body_variants - 1)))
+                data_list = sensor_window(n, columnar=i % 2 == 1, rng=rng)
+                body = json.dumps({"data_list": data_list, "thresholds": THRESHOLDS})
+                GatewayBurstUser.bodies.append((n, body))
+
+    @task
+    def burst(self):
+        for _ in range(random.randint(1, 4)):
+            n, body = random.choice(self.bodies)
+            # A unique query string keeps the response cache out of the measurement
+            with self.client.post(f"/report?burst={random.getrandbits(64):x}", data=body,
+                                  headers={"Content-Type": "application/json"},
+                                  name=f"/report [{10 ** int(math.log10(n))}+ samples]",
+                                  catch_response=True) as response:
+                check_report(response)
+
+
+class NoisySensorUser(HttpUser):
+    """Degraded sensors: random outlier spikes and missing readings in every window."""
+    wait_time = between(0.2, 1)
+    host = "http://localhost:5000"
+
+    @task(3)
+    def noisy_report(self):
+        window = sensor_window(random.randint(50, 5_000), outlier_ratio=random.uniform(0, 0.2),
+                               gap_ratio=random.uniform(0, 0.3), columnar=random.random() < 0.5)
+        with self.client.post("/report", json={"data_list": window, "thresholds": THRESHOLDS},
+                              catch_response=True) as response:
+            check_report(response)
+
+    @task(1)
+    def noisy_batch(self):
+        jobs = [{"asset_id": f"asset-{i}",
+                 "data_list": sensor_window(random.randint(10, 500), outlier_ratio=0.05, gap_ratio=0.1)}
+                for i in range(random.randint(10, 100))]
+        with self.client.post("/report/batch", json={"thresholds": THRESHOLDS, "jobs": jobs},
+                              catch_response=True) as response:
+            if response.status_code == 200 and response.json().get("count") == len(jobs):
+                response.success()
+            else:
+                response.failure(f"Unexpected batch response: {response.status_code}")
+
+
+class MixedTrafficUser(HttpUser):
+    """Production-like endpoint mix: mostly /report polling with some batch and check traffic."""
+    wait_time = between(0.1, 0.5)
+    host = "http://localhost:5000"
+
+    def window(self, keys=SENSORS):
+        return sensor_window(random.randint(10, 2_000), keys=keys, outlier_ratio=0.01)
+
+    @task(45)
+    def report(self):
+        with self.client.post("/report", json={"data_list": self.window(), "thresholds": THRESHOLDS},
+                              catch_response=True) as response:
+            check_report(response)
+
+    @task(20)
+    def analyze(self):
+        payload = {"data_list": self.window(DUO_SENSORS), "thresholds": THRESHOLDS}
+        with self.client.post("/analyze", json=payload, catch_response=True) as response:
+            check_report(response, DUO_SENSORS)
+
+    @task(10)
+    def check_health(self):
+        payload = {"data_list": self.window(DUO_SENSORS), "thresholds": THRESHOLDS}
+        self.client.post("/check_health", json=payload)
+
+    @task(10)
+    def check_health_quad(self):
+        self.client.post("/check_health_quad", json={"data_list": self.window(), "thresholds": THRESHOLDS})
+
+    @task(10)
+    def report_batch(self):
+        jobs = [{"asset_id": f"asset-{i}", "data_list": sensor_window(random.randint(10, 200))}
+                for i in range(50)]
+        self.client.post("/report/batch", json={"thresholds": THRESHOLDS, "jobs": jobs})
+
+    @task(5)
+    def home(self):
+        self.client.get("/")
+
+
+@events.init_command_line_parser.add_listener
+def add_threshold_arguments(parser):
+    group = parser.add_argument_group("SLO thresholds", "Fail the run (exit code 1) when a threshold is missed")
+    group.add_argument("--p50-ms", type=float, default=0, help="Maximum median response time in ms")
+    group.add_argument("--p95-ms", type=float, default=0, help="Maximum 95th percentile response time in ms")
+    group.add_argument("--p99-ms", type=float, default=0, help="Maximum 99th percentile response time in ms")
+    group.add_argument("--min-rps", type=float, default=0, help="Minimum average requests per second")
+    group.add_argument("--max-fail-ratio", type=float, default=0.01, help="Maximum share of failed requests")
+
+
+@events.quitting.add_listener
+def enforce_thresholds(environment, **kwargs):
+    options = environment.parsed_options
+    if options is None:
+        return
+    total = environment.stats.total
+    checks = [
+        ("p50", options.p50_ms, total.get_response_time_percentile(0.50)),
+        ("p95", options.p95_ms, total.get_response_time_percentile(0.95)),
+        ("p99", options.p99_ms, total.get_response_time_percentile(0.99)),
+    ]
+    failures = [f"{name} {value:.0f} ms > {limit:.0f} ms" for name, limit, value in checks
+                if limit and value > limit]
+    if options.min_rps and total.total_rps < options.min_rps:
+        failures.append(f"throughput {total.total_rps:.1f} rps < {options.min_rps:.1f} rps")
+    if total.num_requests and total.fail_ratio > options.max_fail_ratio:
+        failures.append(f"failure ratio {total.fail_ratio:.2%} > {options.max_fail_ratio:.2%}")
+    for failure in failures:
+        logging.error("Threshold missed: %s", failure)
+    if failures:
+        environment.process_exit_code = 1
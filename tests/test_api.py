@@ -2,6 +2,8 @@ import pytest
 import sys
 import os
 import json
+import io
+import numpy as np
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from app.factory import create_app
@@ -198,3 +200,749 @@ def test_report(client, test_data):
     for test_data, expected_status in error_cases:
         response = client.post('/report', json=test_data)
         assert response.status_code == expected_status, f"Failed for test case: {test_data}"
+
+def test_report_batch(client, test_data):
+    payload = {
+        "jobs": [
+            {"asset_id": "pump-1", **test_data},
+            {"asset_id": "pump-2", "data_list": test_data["data_list"]},
+            {"asset_id": "pump-3", "data_list": [], "thresholds": test_data["thresholds"]}
+        ]
+    }
+    response = client.post('/report/batch', json=payload)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["count"] == 3
+    assert data["failed"] == 2
+    first, second, third = data["results"]
+    assert first["asset_id"] == "pump-1"
+    assert first == {"asset_id": "pump-1", **client.post('/report', json=test_data).get_json()}
+    assert second["error"] == "Missing 'data_list' or 'thresholds' in request"
+    assert third["asset_id"] == "pump-3"
+    assert "error" in third
+
+    # Batch-level thresholds apply to jobs that omit their own
+    payload["thresholds"] = test_data["thresholds"]
+    data = client.post('/report/batch', json=payload).get_json()
+    assert data["failed"] == 1
+    assert "error" not in data["results"][1]
+
+    error_cases = [
+        ({}, 400),
+        ({"jobs": []}, 400),
+        ({"jobs": "pump-1"}, 400)
+    ]
+    for invalid_data, expected_status in error_cases:
+        response = client.post('/report/batch', json=invalid_data)
+        assert response.status_code == expected_status, f"Failed for test case: {invalid_data}"
+
+def test_analyze_batch(test_data):
+    client = create_app({"TESTING": True, "RESPONSE_CACHE_SIZE": 0}).test_client()
+    jobs = [{"asset_id": f"fan-{i}", **test_data} for i in range(3)]
+    jobs.append({"asset_id": "fan-bad", "data_list": [{"temperature_one": 1}],
+                 "thresholds": test_data["thresholds"]})
+    response = client.post('/analyze/batch', json=jobs)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["count"] == 4
+    assert data["failed"] == 1
+    assert data["results"][-1] == {"asset_id": "fan-bad", "error": "Failed to analyze sensor data"}
+    for result in data["results"][:3]:
+        assert result["overall_health"] in ["Healthy", "Unhealthy"]
+
+    client.application.config["MAX_BATCH_JOBS"] = 2
+    response = client.post('/analyze/batch', json=jobs)
+    assert response.status_code == 413
+
+def test_analyze_batch_is_cached(client, test_data):
+    jobs = [{"asset_id": f"fan-{i}", **test_data} for i in range(3)]
+    first = client.post('/analyze/batch', json=jobs)
+    second = client.post('/analyze/batch', json=jobs)
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert second.get_json() == first.get_json()
+
+def test_report_columnar(client, test_data):
+    rows = test_data["data_list"] * 4
+    columns = {key: [row[key] for row in rows] for key in rows[0]}
+    for endpoint in ['/report', '/analyze']:
+        expected = client.post(endpoint, json={"data_list": rows, "thresholds": test_data["thresholds"]})
+        response = client.post(endpoint, json={"data_list": columns, "thresholds": test_data["thresholds"]})
+        assert response.status_code == 200
+        assert response.get_json() == expected.get_json()
+
+    # Missing columns and null gaps behave like missing keys in the row format
+    columns["ultrasound_one"] = [45, None, 47, None]
+    del columns["ultrasound_two"]
+    response = client.post('/report', json={"data_list": columns, "thresholds": test_data["thresholds"]})
+    assert response.status_code == 200
+    assert response.get_json()["details"]["ultrasound_one"]["average"] == 46.0
+
+    # The duo analyzer still requires every one of its columns
+    del columns["vibration_z"]
+    response = client.post('/analyze', json={"data_list": columns, "thresholds": test_data["thresholds"]})
+    assert response.status_code == 500
+
+def _npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+def test_report_binary_payloads(client, test_data):
+    rows = test_data["data_list"] * 3
+    names = list(rows[0])
+    expected = client.post('/report', json={"data_list": rows, "thresholds": test_data["thresholds"]}).get_json()
+
+    structured = np.array([tuple(row[n] for n in names) for row in rows],
+                          dtype=[(n, "<f8") for n in names])
+    response = client.post('/report', data=_npy_bytes(structured),
+                           content_type='application/x-npy', query_string=test_data["thresholds"])
+    assert response.status_code == 200
+    assert response.get_json() == expected
+
+    matrix = np.array([[row[n] for n in names] for row in rows])
+    response = client.post('/report', data=_npy_bytes(matrix), content_type='application/x-npy',
+                           query_string={"columns": ",".join(names), **test_data["thresholds"]})
+    assert response.status_code == 200
+    assert response.get_json() == expected
+
+    # A bare matrix without column names cannot be mapped to sensors
+    response = client.post('/report', data=_npy_bytes(matrix), content_type='application/x-npy',
+                           query_string=test_data["thresholds"])
+    assert response.status_code == 415
+
+    response = client.post('/report', data=b"\x00\x01", content_type='application/octet-stream')
+    assert response.status_code == 415
+
+def test_analyze_msgpack_payload(client, test_data):
+    msgpack = pytest.importorskip("msgpack")
+    rows = test_data["data_list"] * 3
+    expected = client.post('/analyze', json={"data_list": rows, "thresholds": test_data["thresholds"]}).get_json()
+
+    body = msgpack.packb({"data_list": rows, "thresholds": test_data["thresholds"]})
+    response = client.post('/analyze', data=body, content_type='application/msgpack')
+    assert response.status_code == 200
+    assert response.get_json() == expected
+
+    columns = {key: np.array([row[key] for row in rows], dtype="<f8").tobytes() for key in rows[0]}
+    body = msgpack.packb({"data_list": columns, "thresholds": test_data["thresholds"]})
+    response = client.post('/analyze', data=body, content_type='application/msgpack')
+    assert response.status_code == 200
+    assert response.get_json() == expected
+
+def test_report_arrow_payload(client, test_data):
+    pa = pytest.importorskip("pyarrow")
+    rows = test_data["data_list"] * 3
+    expected = client.post('/report', json={"data_list": rows, "thresholds": test_data["thresholds"]}).get_json()
+
+    table = pa.table({key: [float(row[key]) for row in rows] for key in rows[0]})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post('/report', data=sink.getvalue(),
+                           content_type='application/vnd.apache.arrow.stream',
+                           query_string=test_data["thresholds"])
+    assert response.status_code == 200
+    assert response.get_json() == expected
+
+def test_report_stream(client, test_data):
+    rows = [dict(test_data["data_list"][0], temperature_one=30 + i) for i in range(12)]
+    for start in range(0, 12, 4):
+        response = client.post('/report/stream', json={
+            "asset_id": "press-7",
+            "data_list": rows[start:start + 4],
+            "thresholds": test_data["thresholds"]
+        })
+        assert response.status_code == 200
+    data = response.get_json()
+    assert data["asset_id"] == "press-7"
+    assert data["window_samples"] == 12
+
+    # The rolling state matches a full /report over the same window
+    expected = client.post('/report', json={"data_list": rows, "thresholds": test_data["thresholds"]}).get_json()
+    for key in ["overall_health", "possible_cause"]:
+        assert data[key] == expected[key]
+    for sensor, info in expected["details"].items():
+        assert data["details"][sensor]["average"] == pytest.approx(info["average"])
+        assert data["details"][sensor]["status"] == info["status"]
+
+    # Polling without new samples reuses the stored window
+    response = client.post('/report/stream', json={"asset_id": "press-7", "thresholds": test_data["thresholds"]})
+    assert response.get_json()["window_samples"] == 12
+
+    assert client.delete('/report/stream/press-7').status_code == 200
+    assert client.delete('/report/stream/press-7').status_code == 404
+    response = client.post('/report/stream', json={"asset_id": "press-7", "thresholds": test_data["thresholds"]})
+    assert response.status_code == 400
+    response = client.post('/report/stream', json=test_data)
+    assert response.status_code == 400
+    for asset_id in [[1], {"id": 1}, 1.5, True]:
+        response = client.post('/report/stream', json=dict(test_data, asset_id=asset_id))
+        assert response.status_code == 400 and "asset_id" in response.get_json()["error"]
+    assert client.post('/report/stream', json=dict(test_data, asset_id=7)).get_json()["asset_id"] == 7
+    assert client.delete('/report/stream/7').status_code == 200
+
+def test_check_health_quad_groups(client, test_data):
+    payload = json.loads(json.dumps(test_data))
+    payload["data_list"][0]["magnetic_flux_y"] = 0.9
+    data = client.post('/check_health_quad', json=payload).get_json()
+    assert data == {
+        "temperature_health": "healthy",
+        "vibration_health": "healthy",
+        "magnetic_flux_health": "unhealthy",
+        "ultrasound_health": "healthy",
+        "overall_health": "Unhealthy"
+    }
+
+    # Columnar payloads go through the same evaluator
+    columns = {key: [value] for key, value in payload["data_list"][0].items()}
+    response = client.post('/check_health', json={"data_list": columns, "thresholds": payload["thresholds"]})
+    assert response.get_json() == {
+        "temperature_health": "healthy",
+        "vibration_health": "healthy",
+        "overall_health": "Healthy"
+    }
+
+    del payload["thresholds"]["ultrasound_two_warning"]
+    response = client.post('/check_health_quad', json=payload)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Missing required field: 'ultrasound_two_warning'"
+
+    del test_data["data_list"][0]["vibration_z"]
+    response = client.post('/check_health', json=test_data)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Missing required field: 'vibration_z'"
+
+def test_threshold_profiles(client, test_data):
+    response = client.post('/profiles', json={"thresholds": test_data["thresholds"]})
+    assert response.status_code == 201
+    profile_id = response.get_json()["profile_id"]
+    assert client.post('/profiles', json={"thresholds": test_data["thresholds"]}).get_json()["profile_id"] == profile_id
+    assert client.get(f'/profiles/{profile_id}').get_json()["thresholds"] == test_data["thresholds"]
+
+    by_reference = {"data_list": test_data["data_list"], "profile_id": profile_id}
+    for endpoint in ['/check_health', '/analyze', '/check_health_quad', '/report']:
+        expected = client.post(endpoint, json=test_data)
+        response = client.post(endpoint, json=by_reference)
+        assert response.status_code == 200, endpoint
+        assert response.get_json() == expected.get_json()
+
+    data = client.post('/report/batch', json={
+        "profile_id": profile_id,
+        "jobs": [{"asset_id": "a", "data_list": test_data["data_list"]},
+                 {"asset_id": "b", "data_list": test_data["data_list"], "profile_id": "missing"}]
+    }).get_json()
+    assert "error" not in data["results"][0]
+    assert data["results"][1]["error"] == "Unknown threshold profile 'missing'"
+
+    # A non-string profile ID fails only its own job, in JSON and NDJSON output alike
+    jobs = [{"asset_id": "a", "data_list": test_data["data_list"], "profile_id": ["x"]},
+            {"asset_id": "b", "data_list": test_data["data_list"], "profile_id": {"x": 1}},
+            {"asset_id": "c", "data_list": test_data["data_list"]}]
+    data = client.post('/report/batch', json={"profile_id": profile_id, "jobs": jobs}).get_json()
+    assert data["failed"] == 2 and "error" not in data["results"][2]
+    response = client.post('/report/batch', json={"profile_id": profile_id, "jobs": jobs},
+                           headers={"Accept": "application/x-ndjson"})
+    assert [("error" in json.loads(line)) for line in response.get_data(as_text=True).splitlines()] == [True, True, False]
+    assert client.post('/report', json={"data_list": test_data["data_list"], "profile_id": ["x"]}).status_code == 404
+
+    response = client.post('/report', json={"data_list": test_data["data_list"], "profile_id": "missing"})
+    assert response.status_code == 404
+    assert client.get('/profiles/missing').status_code == 404
+    assert client.post('/profiles', json={"thresholds": {}}).status_code == 400
+    assert client.post('/profiles', json={"thresholds": {"vibration_X_healthy": "low"}}).status_code == 400
+    response = client.post('/profiles', json={"thresholds": {"vibration_X_healthy": 0.5, "vibration_X_warning": 0.1}})
+    assert response.status_code == 400 and "vibration_X_healthy" in response.get_json()["error"]
+
+    # Binary bodies reference the profile in the query string
+    names = list(test_data["data_list"][0])
+    structured = np.array([tuple(test_data["data_list"][0][n] for n in names)], dtype=[(n, "<f8") for n in names])
+    response = client.post('/report', data=_npy_bytes(structured), content_type='application/x-npy',
+                           query_string={"profile_id": profile_id})
+    assert response.status_code == 200
+    assert response.get_json() == client.post('/report', json=test_data).get_json()
+
+def test_asgi_adapter(test_data):
+    import asyncio
+    from app.asgi import create_asgi_app
+
+    asgi_app = create_asgi_app(create_app())
+    body = json.dumps(test_data).encode()
+
+    async def call(path, payload):
+        # Deliver the body in two chunks like a slow client would
+        messages = [
+            {"type": "http.request", "body": payload[:10], "more_body": True},
+            {"type": "http.request", "body": payload[10:], "more_body": False},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": path, "query_string": b"",
+                 "headers": [(b"content-type", b"application/json")], "http_version": "1.1"}
+        await asgi_app(scope, receive, send)
+        return sent
+
+    async def run_all():
+        return await asyncio.gather(*(call(path, body) for path in
+                                      ['/report', '/analyze', '/check_health', '/check_health_quad']))
+
+    for sent in asyncio.run(run_all()):
+        assert sent[0]["type"] == "http.response.start"
+        assert sent[0]["status"] == 200
+        payload = b"".join(m.get("body", b"") for m in sent[1:])
+        assert json.loads(payload)["overall_health"] in ["Healthy", "Unhealthy"]
+        assert sent[-1]["more_body"] is False
+
+    async def interrupted(app, messages, headers=()):
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/report", "query_string": b"",
+                 "headers": [(b"content-type", b"application/json"), *headers], "http_version": "1.1"}
+        await app(scope, receive, send)
+        return sent
+
+    # A client that disconnects mid-upload never reaches the view
+    disconnect = [{"type": "http.request", "body": body[:10], "more_body": True}, {"type": "http.disconnect"}]
+    assert asyncio.run(interrupted(asgi_app, disconnect)) == []
+
+    small = create_asgi_app(create_app({"TESTING": True, "ASGI_MAX_BODY": 100}))
+    chunks = [{"type": "http.request", "body": body[i:i + 60], "more_body": True} for i in range(0, len(body), 60)]
+    for headers in [(), [(b"content-length", str(len(body)).encode())]]:
+        sent = asyncio.run(interrupted(small, list(chunks), headers))
+        assert sent[0]["status"] == 413 and json.loads(sent[1]["body"]) == {"error": "Request body too large"}
+
+    # Bodies buffered at once share one byte budget, released once each response is sent
+    busy = create_asgi_app(create_app({"TESTING": True, "ASGI_MAX_BUFFERED": len(body) + 50}))
+
+    async def overlapping():
+        gate = asyncio.Event()
+        held = [{"type": "http.request", "body": body[:60], "more_body": True}]
+
+        async def slow_receive():
+            if held:
+                return held.pop(0)
+            await gate.wait()
+            return {"type": "http.request", "body": body[60:], "more_body": False}
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "POST", "path": "/report", "query_string": b"",
+                 "headers": [(b"content-type", b"application/json")], "http_version": "1.1"}
+        first = asyncio.ensure_future(busy(scope, slow_receive, send))
+        await asyncio.sleep(0)
+        rejected = await interrupted(busy, list(chunks))
+        gate.set()
+        await first
+        return rejected, await interrupted(busy, [*chunks[:-1], {**chunks[-1], "more_body": False}])
+
+    rejected, accepted = asyncio.run(overlapping())
+    assert rejected[0]["status"] == 503 and accepted[0]["status"] == 200
+    assert busy._buffered == 0
+    for headers in [(), [(b"content-length", str(len(body)).encode())]]:
+        asyncio.run(interrupted(busy, [chunks[0], {"type": "http.disconnect"}], headers))
+    assert busy._buffered == 0
+
+def test_response_cache(client, test_data):
+    first = client.post('/report', json=test_data)
+    second = client.post('/report', json=test_data)
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.get_json() == first.get_json()
+
+    # The endpoint is part of the key, and errors are never cached
+    assert client.post('/analyze', json=test_data).headers["X-Cache"] == "MISS"
+    for _ in range(2):
+        response = client.post('/report', json={"data_list": []})
+        assert response.status_code == 500
+        assert response.headers["X-Cache"] == "MISS"
+
+    stats = client.get('/cache/stats').get_json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+    assert stats["entries"] == 2
+
+def test_response_cache_expiry():
+    from app.cache import ResponseCache
+    cache = ResponseCache(max_entries=2, ttl=60, max_body=100)
+    for i in range(3):
+        cache.put(i, str(i))
+    assert cache.get(0) is None
+    assert cache.get(2) == "2"
+    cache.ttl = -1
+    cache.put(3, "3")
+    assert cache.get(3) is None
+    assert cache.stats()["evictions"] == 3
+
+    # Stored bytes are bounded too
+    cache = ResponseCache(max_entries=10, ttl=60, max_body=100, max_bytes=250)
+    for i in range(4):
+        cache.put(i, str(i), 100)
+    assert [cache.get(i) for i in range(4)] == [None, None, "2", "3"]
+    assert cache.stats()["bytes"] == 200
+
+def test_response_cache_skips_bodies_without_length(client, test_data):
+    body = json.dumps(test_data).encode()
+    for _ in range(2):
+        response = client.post('/report', input_stream=io.BytesIO(body), content_type='application/json',
+                               headers={"Transfer-Encoding": "chunked"},
+                               environ_overrides={"wsgi.input_terminated": True})
+        assert response.status_code == 200 and "X-Cache" not in response.headers
+
+def test_benchmark_runner_smoke(tmp_path):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+    from run_benchmarks import main as run_benchmarks
+    output = tmp_path / "bench.json"
+    results = run_benchmarks(["--sizes", "1", "50", "--outlier-ratios", "0.1",
+                              "--min-time", "0", "--max-repeats", "3", "--output", str(output)])
+    names = {r["name"] for r in results}
+    assert {"adaptive_mean", "robust_means", "analyze_quad_rows", "POST /report", "POST /check_health"} <= names
+    saved = json.loads(output.read_text())
+    assert len(saved["results"]) == len(results)
+    assert "numpy" in saved["environment"]
+
+def test_metrics(client, test_data):
+    client.post('/report', json=test_data)
+    client.post('/check_health', json=test_data)
+    client.post('/report', json={})
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    assert 'asset_health_requests_total{endpoint="/report",method="POST",status="200"}' in text
+    assert 'asset_health_requests_total{endpoint="/report",method="POST",status="500"}' in text
+    for stage in ["parse", "extract", "compute", "serialize"]:
+        assert f'asset_health_stage_seconds_count{{endpoint="/report",stage="{stage}"}}' in text
+    assert 'asset_health_stage_seconds_count{endpoint="/check_health",stage="compute"}' in text
+    assert 'asset_health_request_bytes_bucket{endpoint="/report"' in text
+    assert 'endpoint="/metrics"' not in text
+
+def test_profiling_hook(test_data, tmp_path):
+    app = create_app({"TESTING": True, "PROFILING_ALLOW_HEADER": True, "RESPONSE_CACHE_SIZE": 0,
+                      "PROFILE_DIR": str(tmp_path), "PROFILE_KEEP": 2})
+    client = app.test_client()
+    response = client.post('/report', json=test_data)
+    assert "Server-Timing" not in response.headers
+
+    for _ in range(3):
+        response = client.post('/report', json=test_data, headers={"X-Profile": "1"})
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    for stage in ["parse", "extract", "compute", "serialize", "total"]:
+        assert f"{stage};dur=" in timing
+    assert "cum=" in response.headers["X-Profile-Top"]
+    profiles = sorted(p.name for p in tmp_path.glob("*.prof"))
+    assert len(profiles) == 2
+    assert f"{response.headers['X-Profile-Id']}.prof" in profiles
+
+    response = create_app({"TESTING": True}).test_client().post(
+        '/report', json=test_data, headers={"X-Profile": "1"})
+    assert "Server-Timing" not in response.headers
+
+def _strict_json(response):
+    def reject(constant):
+        raise ValueError(f"invalid JSON constant {constant}")
+    return json.loads(response.get_data(as_text=True), parse_constant=reject)
+
+def test_json_provider_nan_and_numpy(client, test_data, monkeypatch):
+    # A sensor with no readings averages to NaN, which must serialize as null
+    columns = {key: [value] for key, value in test_data["data_list"][0].items()}
+    del columns["ultrasound_two"]
+    response = client.post('/report', json={"data_list": columns, "thresholds": test_data["thresholds"]})
+    assert response.status_code == 200
+    assert _strict_json(response)["details"]["ultrasound_two"]["average"] is None
+
+    from app import json_provider
+    provider = client.application.json
+    values = {"b": np.array([1.5, np.nan]), "a": np.float32(2.5), "c": np.int64(3), "d": np.arange(4.0)[::2]}
+    expected = '{"a":2.5,"b":[1.5,null],"c":3,"d":[0.0,2.0]}'
+    assert provider.dumps(values) == expected
+    monkeypatch.setattr(json_provider, "orjson", None)
+    assert provider.dumps(values) == expected
+    assert provider.loads('{"x": NaN}')["x"] != provider.loads('{"x": NaN}')["x"]
+
+def test_ndjson_ingestion(client, test_data, monkeypatch):
+    from app import payloads
+    monkeypatch.setattr(payloads, "NDJSON_CHUNK_BYTES", 64)  # force rows to span chunks
+    row = test_data["data_list"][0]
+    rows = [dict(row, temperature_one=35 + i) for i in range(20)]
+    rows[3].pop("ultrasound_two")
+    rows[5]["vibration_x"] = None
+    lines = "\n".join(json.dumps(r) for r in rows) + "\n"
+    for endpoint in ['/report', '/analyze']:
+        expected = client.post(endpoint, json={"data_list": rows, "thresholds": test_data["thresholds"]})
+        header = json.dumps({"thresholds": test_data["thresholds"]}) + "\n"
+        response = client.post(endpoint, data=header + lines, content_type='application/x-ndjson')
+        assert response.status_code == 200
+        assert response.get_json() == expected.get_json()
+        assert "X-Cache" not in response.headers
+        response = client.post(endpoint, data=lines, query_string=test_data["thresholds"],
+                               content_type='application/x-ndjson')
+        assert response.get_json() == expected.get_json()
+
+    response = client.post('/report', data=lines + "[1, 2]\n", query_string=test_data["thresholds"],
+                           content_type='application/x-ndjson')
+    assert response.status_code == 415
+
+def test_batch_ndjson_response(client, test_data):
+    payload = {"thresholds": test_data["thresholds"], "jobs": [
+        {"asset_id": "pump-1", "data_list": test_data["data_list"]},
+        {"asset_id": "pump-2", "data_list": []},
+        {"asset_id": "pump-3", "data_list": test_data["data_list"]}
+    ]}
+    expected = client.post('/report/batch', json=payload).get_json()["results"]
+    for _ in range(2):  # the JSON response above must not be served from the cache
+        response = client.post('/report/batch', json=payload, headers={"Accept": "application/x-ndjson"})
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == "application/x-ndjson"
+        assert "X-Cache" not in response.headers
+        lines = response.get_data(as_text=True).splitlines()
+        assert [json.loads(line) for line in lines] == expected
+
+    response = client.post('/analyze/batch', json={"jobs": []}, headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 400
+
+def test_batch_ndjson_response_over_asgi(test_data):
+    # The stream is pulled chunk by chunk on the adapter's thread pool, so the
+    # request context must survive hops between threads
+    import asyncio
+    from app.asgi import create_asgi_app
+    asgi_app = create_asgi_app(create_app({"TESTING": True, "ASGI_WORKER_THREADS": 4}))
+    jobs = [{"asset_id": f"pump-{i}", "data_list": test_data["data_list"]} for i in range(25)]
+    body = json.dumps({"thresholds": test_data["thresholds"], "jobs": jobs}).encode()
+
+    async def call():
+        messages = [{"type": "http.request", "body": body, "more_body": False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": "/report/batch", "query_string": b"",
+                 "headers": [(b"content-type", b"application/json"), (b"accept", b"application/x-ndjson")],
+                 "http_version": "1.1"}
+        await asgi_app(scope, receive, send)
+        return sent
+
+    async def run_all():
+        return await asyncio.gather(*(call() for _ in range(10)))
+
+    for _ in range(2):
+        for sent in asyncio.run(run_all()):
+            assert sent[0]["status"] == 200 and sent[-1]["more_body"] is False
+            lines = b"".join(m.get("body", b"") for m in sent[1:]).splitlines()
+            assert [json.loads(line)["asset_id"] for line in lines] == [job["asset_id"] for job in jobs]
+
+def test_float32_precision(client, test_data):
+    rows = [dict(test_data["data_list"][0], vibration_x=0.2 + i * 1e-3) for i in range(50)]
+    payload = {"data_list": rows, "thresholds": test_data["thresholds"]}
+    exact = client.post('/report', json=payload).get_json()
+    approx = client.post('/report', json=dict(payload, precision="float32")).get_json()
+    assert approx["overall_health"] == exact["overall_health"]
+    for key, info in exact["details"].items():
+        assert approx["details"][key]["average"] == pytest.approx(info["average"], rel=1e-6)
+        assert approx["details"][key]["status"] == info["status"]
+
+    response = client.post('/analyze?precision=float16', json=payload)
+    assert response.status_code == 400
+    response = client.post('/report/batch?precision=float32', json={"jobs": [payload]})
+    assert response.get_json()["results"][0]["details"] == approx["details"]
+
+    matrix = np.asfortranarray([[r["temperature_one"], r["vibration_x"]] for r in rows])
+    response = client.post('/report', data=_npy_bytes(matrix), content_type='application/x-npy',
+                           query_string={"columns": "temperature_one,vibration_x", "precision": "float32",
+                                         **test_data["thresholds"]})
+    assert response.status_code == 200
+    assert response.get_json()["details"]["vibration_x"]["average"] == pytest.approx(
+        exact["details"]["vibration_x"]["average"], rel=1e-6)
+
+def test_approximate_mode(test_data):
+    app = create_app({"TESTING": True, "APPROXIMATE_RANK_ERROR": 0.1})  # 265-sample estimate
+    client = app.test_client()
+    rng = np.random.default_rng(0)
+    row = test_data["data_list"][0]
+    columns = {key: (value * rng.normal(1, 0.02, 2000)).tolist() for key, value in row.items()}
+    payload = {"data_list": columns, "thresholds": test_data["thresholds"]}
+    exact = client.post('/report', json=payload).get_json()
+    approx = client.post('/report', json=dict(payload, approximate=True)).get_json()
+    assert "approximation" not in exact["details"]["temperature_one"]
+    for key, info in approx["details"].items():
+        assert info["approximation"] == {"sample_size": 265, "rank_error": 0.1, "confidence": 0.99}
+        assert info["average"] == pytest.approx(exact["details"][key]["average"], rel=1e-3)
+    assert approx["overall_health"] == exact["overall_health"]
+
+    small = {"data_list": test_data["data_list"], "thresholds": test_data["thresholds"]}
+    response = client.post('/analyze?approximate=true', json=small)
+    assert "approximation" not in response.get_json()["details"]["temperature_one"]
+
+def test_report_trend(client, test_data):
+    row = test_data["data_list"][0]
+    rows = [dict(row, timestamp=1_699_999_200 + 60 * i, temperature_one=35 + (i >= 60) * 30) for i in range(120)]
+    payload = {"data_list": rows, "thresholds": test_data["thresholds"], "bucket_seconds": 3600}
+    response = client.post('/report/trend', json=payload)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["bucket_seconds"] == 3600
+    assert [b["samples"] for b in data["buckets"]] == [60, 60]
+    first, last = data["buckets"]
+    assert first["start"] == 1_699_999_200 and last["start"] == first["start"] + 3600
+    assert first["overall_health"] == "Healthy"
+    assert first["details"]["temperature_one"] == {"average": 35.0, "median": 35.0, "mad": 0.0,
+                                                  "status": "GOOD", "low": 30.0, "high": 50.0}
+    assert last["overall_health"] == "Unhealthy"
+    assert last["details"]["temperature_one"]["average"] == 65.0
+
+    # Each bucket matches /report on that bucket's samples
+    expected = client.post('/report', json={"data_list": rows[:60], "thresholds": test_data["thresholds"]})
+    assert expected.get_json()["details"]["vibration_x"]["average"] == first["details"]["vibration_x"]["average"]
+
+    columns = {key: [r[key] for r in rows] for key in rows[0]}
+    response = client.post('/report/trend?bucket_seconds=3600',
+                           json={"data_list": columns, "thresholds": test_data["thresholds"]})
+    assert response.get_json() == data
+
+    # A .npy matrix carries the timestamps as a column, wherever it sits
+    names = list(rows[0])
+    for order in (names, names[::-1], names[:3] + ["timestamp"] + names[3:]):
+        order = list(dict.fromkeys(order))
+        matrix = np.array([[r[n] for n in order] for r in rows])
+        response = client.post('/report/trend', data=_npy_bytes(matrix), content_type='application/x-npy',
+                               query_string={"columns": ",".join(order), "bucket_seconds": 3600,
+                                             **test_data["thresholds"]})
+        assert response.status_code == 200
+        assert response.get_json() == data
+
+    for invalid in [0, -60, "Infinity", "NaN", "hourly"]:
+        assert client.post('/report/trend', json=dict(payload, bucket_seconds=invalid)).status_code == 400
+    assert client.post('/report/trend', json={**payload, "data_list": test_data["data_list"]}).status_code == 400
+    columns = {key: [row[key] for row in rows] for key in rows[0]}
+    response = client.post('/report/trend', json={**payload, "data_list": dict(columns, timestamp=columns["timestamp"][:-1])})
+    assert response.status_code == 400 and response.get_json()["error"] == "Invalid 'data_list': Expected one timestamp per sample"
+    assert client.post('/report/trend', json=dict(payload, bucket_seconds=1)).status_code == 200
+    client.application.config["MAX_TREND_BUCKETS"] = 2
+    assert client.post('/report/trend', json=dict(payload, bucket_seconds=60)).status_code == 413
+
+def test_archive(test_data, tmp_path):
+    app = create_app({"TESTING": True, "ARCHIVE_DIR": str(tmp_path)})
+    client = app.test_client()
+    row = test_data["data_list"][0]
+    rows = [dict(row, timestamp=1000 + i, temperature_one=30 + i % 7) for i in range(100)]
+    for chunk in (rows[50:], rows[:50]):  # arrival order does not matter
+        response = client.post('/archive/pump-1', json={"data_list": chunk})
+    assert response.status_code == 201
+    assert response.get_json() == {"asset_id": "pump-1", "appended": 50, "samples": 100}
+
+    thresholds = test_data["thresholds"]
+    for start, end in [(None, None), (1010, 1040), (1090, None)]:
+        selected = [r for r in rows if (start is None or r["timestamp"] >= start)
+                    and (end is None or r["timestamp"] < end)]
+        expected = client.post('/report', json={"data_list": selected, "thresholds": thresholds}).get_json()
+        response = client.post('/archive/pump-1/report', json={"thresholds": thresholds, "start": start, "end": end})
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data.pop("window_samples") == len(selected) and data.pop("asset_id") == "pump-1"
+        assert data == expected
+
+    assert client.post('/archive/pump-1/report', json={"thresholds": thresholds, "start": 5000}).status_code == 400
+    assert client.post('/archive/pump-2/report', json={"thresholds": thresholds}).status_code == 404
+
+    band = dict(thresholds, temperature_skin_healthy=31, temperature_skin_warning=35)
+    response = client.post('/archive/pump-1/violations', json={"thresholds": band, "start": 1000, "end": 1050, "limit": 3})
+    assert response.status_code == 200
+    data = response.get_json()
+    outside = [r for r in rows[:50] if not 31 <= r["temperature_one"] <= 35]
+    assert data["counts"]["temperature_one"] == len(outside)
+    assert data["samples"] == [{"timestamp": r["timestamp"], "sensor": "temperature_one", "value": r["temperature_one"]}
+                               for r in outside[:3]]
+    assert client.post('/archive/pump-1/violations', json={"thresholds": band, "limit": "x"}).status_code == 400
+    for endpoint in ['report', 'violations', 'summary']:
+        for invalid in [[1], "high", {"temperature_skin_healthy": "low"}]:
+            response = client.post(f'/archive/pump-1/{endpoint}', json={"thresholds": invalid})
+            assert response.status_code == 400 and response.get_json()["error"] == "Invalid 'thresholds' in request"
+    assert client.post('/archive/pump-2/violations', json={"thresholds": band}).status_code == 404
+    for timestamp in [1e300, -1e300, 1e12]:
+        response = client.post('/archive/pump-2', json={"data_list": [dict(rows[0], timestamp=timestamp)]})
+        assert response.status_code == 400 and "timestamp" in response.get_json()["error"].lower()
+    assert client.post('/archive/pump-2/summary', json={"thresholds": thresholds}).status_code == 404
+    assert client.delete('/archive/pump-1').status_code == 200
+    assert client.post('/archive/pump-1/report', json={"thresholds": thresholds}).status_code == 404
+    assert create_app({"TESTING": True}).test_client().post('/archive/pump', json=test_data).status_code == 404
+
+    # Timestamps sent as a .npy matrix column are archived, not replaced by the arrival time
+    names = ["timestamp"] + list(row)
+    matrix = np.array([[r[n] for n in names] for r in rows])
+    client.post('/archive/pump-3', data=_npy_bytes(matrix), content_type='application/x-npy',
+                query_string={"columns": ",".join(names)})
+    response = client.post('/archive/pump-3/report', json={"thresholds": thresholds, "start": 1010, "end": 1040})
+    assert response.get_json()["window_samples"] == 30
+
+
+def test_archive_summary(test_data, tmp_path):
+    client = create_app({"TESTING": True, "ARCHIVE_DIR": str(tmp_path)}).test_client()
+    row = test_data["data_list"][0]
+    rows = [dict(row, timestamp=1_699_920_000 + 10 * i, temperature_one=30 + i % 5) for i in range(720)]
+    client.post('/archive/pump-1', json={"data_list": rows})
+    thresholds = test_data["thresholds"]
+
+    response = client.post('/archive/pump-1/summary', json={"thresholds": thresholds, "granularity": "minute"})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["end"] - data["start"] == 60 and data["start"] <= rows[-1]["timestamp"] < data["end"]
+    assert data["window_samples"] == sum(data["start"] <= r["timestamp"] for r in rows)
+
+    response = client.post('/archive/pump-1/summary', json={"thresholds": thresholds, "granularity": "day"})
+    data = response.get_json()
+    assert data["window_samples"] == 720 and data["sensors"]["temperature_one"]["max"] == 34
+    report = client.post('/report', json={"data_list": rows, "thresholds": thresholds}).get_json()
+    assert data["overall_health"] == report["overall_health"]
+    for key, detail in data["details"].items():
+        assert abs(detail["average"] - report["details"][key]["average"]) <= 0.01 * abs(report["details"][key]["average"])
+
+    assert client.post('/archive/pump-1/summary', json={"thresholds": thresholds, "granularity": "week"}).status_code == 400
+    assert client.post('/archive/pump-1/summary', json={"thresholds": thresholds, "start": 0, "end": 1}).status_code == 400
+    assert client.post('/archive/pump-2/summary', json={"thresholds": thresholds}).status_code == 404
+
+
+def test_startup_imports_stay_lazy(tmp_path):
+    # Guards cold-start time: building an app without the Swagger UI, metrics or
+    # profiling must not import these, and the spec is served from a JSON cache
+    import subprocess
+    heavy = ["flasgger", "yaml", "pandas", "prometheus_client", "cProfile", "multiprocessing"]
+    script = (
+        "import sys, json; from app.factory import create_app; "
+        "app = create_app({'SWAGGER_UI': False, 'METRICS_ENABLED': False}); "
+        f"print(json.dumps([m for m in {heavy!r} if m in sys.modules]))"
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == []
+
+    cache = str(tmp_path / "swagger.json")
+    expected = create_app({"SWAGGER_SPEC_CACHE": cache}).test_client().get('/apispec.json').get_json()
+    assert os.path.exists(cache)
+    client = create_app({"SWAGGER_UI": False, "SWAGGER_SPEC_CACHE": cache}).test_client()
+    assert client.get('/apispec.json').get_json()["paths"].keys() == expected["paths"].keys()
+    assert client.get('/apidocs/').status_code == 404
+
+
+def test_process_pool_offload_is_opt_in():
+    from app.health_utils import _offload
+    create_app()
+    assert _offload["min_samples"] == 0
+    create_app({"OFFLOAD_MIN_SAMPLES": 200000})
+    assert _offload["min_samples"] == 200000
+    create_app()
@@ -0,0 +1,366 @@
+import sys
+import os
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.health_utils import robust_means, adaptive_mean, sensor_matrix, field_alias
+from app.streaming import RollingSensor
+
+def reference_adaptive_mean(vals, k_outlier=3.5, max_frac=0.05):
+    vals = vals[~np.isnan(vals)]
+    if vals.size == 0:
+        return np.nan
+    med = np.median(vals)
+    mad = np.median(np.abs(vals - med))
+    if mad == 0:
+        return float(med)
+    mask_out = np.abs(vals - med) > k_outlier * 1.4826 * mad
+    if mask_out.sum() / vals.size <= max_frac:
+        vals = vals[~mask_out]
+    return float(vals.mean())
+
+@pytest.mark.parametrize("n_samples", [0, 1, 2, 7, 100, 1001])
+def test_robust_means_matches_per_column_reference(n_samples):
+    rng = np.random.default_rng(n_samples)
+    matrix = rng.normal(20, 2, size=(n_samples, 6))
+    matrix[rng.random(matrix.shape) < 0.03] += 100   # sparse outliers
+    matrix[rng.random(matrix.shape) < 0.1] = np.nan  # gaps
+    matrix[:, 4] = np.round(matrix[:, 4])            # ties, often zero MAD
+    if n_samples:
+        matrix[:, 5] = np.nan                        # an empty sensor
+
+    result = robust_means(matrix)
+    for j in range(matrix.shape[1]):
+        expected = reference_adaptive_mean(matrix[:, j])
+        if np.isnan(expected):
+            assert np.isnan(result[j])
+        else:
+            assert result[j] == pytest.approx(expected, rel=1e-12)
+
+def test_robust_means_trims_only_rare_outliers():
+    rare = np.r_[np.full(99, 10.0) + np.linspace(-1, 1, 99), 1000.0]
+    common = np.r_[np.full(90, 10.0) + np.linspace(-1, 1, 90), np.full(10, 1000.0)]
+    result = robust_means(np.column_stack([rare, common]))
+    assert result[0] == pytest.approx(10.0)
+    assert result[1] == pytest.approx(common.mean())
+    assert adaptive_mean(np.array([])) != adaptive_mean(np.array([]))  # NaN
+
+def test_sensor_matrix_pads_columns():
+    matrix = sensor_matrix({"temperature_one": [1, 2, 3], "vibration_x": [4]},
+                           list(field_alias), required=False)
+    assert matrix.shape == (3, len(field_alias))
+    assert matrix.flags.f_contiguous
+    assert np.isnan(matrix[1:, 2]).all()
+    with pytest.raises(KeyError):
+        sensor_matrix({"temperature_one": [1]}, list(field_alias))
+
+@pytest.mark.parametrize("seed", range(5))
+def test_float32_robust_means_within_documented_bound(seed):
+    # float32 inputs carry a relative rounding error of at most 2**-24, and the
+    # sums accumulate in float64: results stay within 2**-23 * max|x| per sensor
+    # unless a reading sits at the trim cut (see the test below).
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(rng.uniform(-100, 100, 8), rng.uniform(0.01, 10, 8), size=(5000, 8))
+    matrix[rng.random(matrix.shape) < 0.02] *= 20
+    matrix[rng.random(matrix.shape) < 0.05] = np.nan
+    matrix[:, 7] = np.round(matrix[:, 7])  # zero MAD: the median is returned
+    exact = robust_means(np.asfortranarray(matrix))
+    approx = robust_means(np.asfortranarray(matrix.astype(np.float32)))
+    assert approx.dtype == np.float64
+    bound = 2.0 ** -23 * np.nanmax(np.abs(matrix), axis=0)
+    assert (np.abs(exact - approx) <= bound).all()
+
+def test_float32_reading_at_the_trim_cut():
+    # Rounding a reading that sits at the trim cut can move it across the cut.
+    # The average then also moves by that reading's share, as documented.
+    base = 10 + np.linspace(-1, 1, 999)
+    column = np.r_[base, 1000.0]
+    med = np.median(column)
+    cut = med + 3.5 * 1.4826 * np.median(np.abs(column - med))
+    column[-1] = cut + 1e-7  # trimmed in float64, kept after rounding to float32
+    exact = robust_means(column[:, np.newaxis])[0]
+    approx = robust_means(column.astype(np.float32)[:, np.newaxis])[0]
+    bound = 2.0 ** -23 * np.abs(column).max()
+    assert exact == pytest.approx(base.mean()) and abs(exact - approx) > bound
+    assert abs(exact - approx) <= bound + abs(column[-1] - exact) / (column.size - 1)
+
+def test_approximate_robust_means():
+    from app.health_utils import approximate_robust_means, dkw_sample_size
+    assert dkw_sample_size(0.01, 0.99) == 26492
+    rng = np.random.default_rng(3)
+    matrix = rng.normal(50, 5, size=(200_000, 4))
+    matrix[rng.random(matrix.shape) < 0.01] += 500
+    matrix[rng.random(matrix.shape) < 0.05] = np.nan
+    matrix = np.asfortranarray(matrix)
+    exact = robust_means(matrix)
+    small = matrix[:1000]
+    assert np.array_equal(approximate_robust_means(small, sample_size=5000), robust_means(small))
+    approx = approximate_robust_means(matrix, sample_size=dkw_sample_size(0.01))
+    # Only the trimming cut is estimated; the mean itself uses every sample
+    assert np.allclose(approx, exact, rtol=1e-3)
+    assert np.array_equal(approx, approximate_robust_means(matrix, sample_size=dkw_sample_size(0.01)))
+
+def test_bucket_robust_stats_match_per_bucket_reference():
+    from app.health_utils import bucket_robust_stats
+    rng = np.random.default_rng(7)
+    matrix = rng.normal(20, 2, size=(3000, 5))
+    matrix[rng.random(matrix.shape) < 0.03] += 100
+    matrix[rng.random(matrix.shape) < 0.1] = np.nan
+    matrix[:, 4] = np.round(matrix[:, 4])
+    buckets = rng.integers(0, 12, size=3000)
+    matrix[buckets == 3, 2] = np.nan  # a sensor with no readings in one bucket
+    means, medians, mads = bucket_robust_stats(np.asfortranarray(matrix), buckets, 12)
+    for b in range(12):
+        rows = matrix[buckets == b]
+        expected = [reference_adaptive_mean(rows[:, j]) for j in range(5)]
+        np.testing.assert_allclose(means[b], expected, rtol=1e-12)
+        np.testing.assert_allclose(medians[b], np.nanmedian(rows, axis=0) if b != 3 else
+                                   [*np.nanmedian(rows[:, :2], axis=0), np.nan, *np.nanmedian(rows[:, 3:], axis=0)])
+
+def test_sensor_window_is_read_without_copies():
+    from app.health_utils import (SensorWindow, analyze_sensor_data_duo, analyze_sensor_data_quad,
+                                  field_alias_duo, QUAD_SCHEMA)
+    rng = np.random.default_rng(1)
+    rows = [dict(zip(field_alias, r)) for r in rng.normal(40, 2, size=(50, len(field_alias))).tolist()]
+    for i, row in enumerate(rows):
+        row["timestamp"] = 1_700_000_000 + i
+    window = SensorWindow.from_data(rows, timestamp_key="timestamp")
+    assert window.columns == QUAD_SCHEMA.keys and len(window) == 50
+    assert window.timestamps[-1] == 1_700_000_049
+    assert sensor_matrix(window, QUAD_SCHEMA.keys) is window.values
+    duo = sensor_matrix(window, list(field_alias_duo))
+    assert np.shares_memory(duo, window.values) and duo.flags.f_contiguous
+    assert np.shares_memory(window.column("ultrasound_two"), window.values)
+
+    thresholds = {"temperature_skin_healthy": 30, "temperature_skin_warning": 50}
+    for analyzer, alias in [(analyze_sensor_data_quad, field_alias), (analyze_sensor_data_duo, field_alias_duo)]:
+        assert analyzer(window, thresholds, alias) == analyzer(rows, thresholds, alias)
+
+    partial = SensorWindow(window.values[:, [0, 4]], ["temperature_one", "ultrasound_two"])
+    assert np.isnan(sensor_matrix(partial, QUAD_SCHEMA.keys, required=False)[:, 1]).all()
+    with pytest.raises(KeyError):
+        sensor_matrix(partial, list(field_alias_duo))
+
+def test_archive_recovers_torn_appends(tmp_path):
+    from app.archive import SampleArchive
+    from app.health_utils import SensorWindow
+    archive = SampleArchive(str(tmp_path), ["a", "b"])
+    archive.append("pump", SensorWindow([[1.0, 2.0], [3.0, 4.0]], ["a", "b"], [20.0, 10.0]))
+    with open(tmp_path / "pump".encode().hex() / "a.f8", "ab") as f:
+        f.write(np.float64(99).tobytes())  # a crash after writing one column
+    wider = SampleArchive(str(tmp_path), ["a", "b", "c"])
+    assert wider.append("pump", SensorWindow([[5.0, 6.0, 7.0]], ["a", "b", "c"], [30.0])) == 3
+    window = wider.read("pump")
+    assert window.timestamps.tolist() == [10.0, 20.0, 30.0]
+    np.testing.assert_array_equal(window.values, [[3, 4, np.nan], [1, 2, np.nan], [5, 6, 7]])
+    assert wider.read("pump", 15, 30).timestamps.tolist() == [20.0]
+    assert wider.assets() == ["pump"] and wider.read("other") is None
+
+def test_archive_index_range_and_violation_queries(tmp_path, monkeypatch):
+    from app import archive as archive_module
+    from app.archive import SampleArchive
+    from app.health_utils import SensorWindow
+    monkeypatch.setattr(archive_module, "BLOCK_ROWS", 16)
+    archive = SampleArchive(str(tmp_path), ["a", "b"])
+    rng = np.random.default_rng(5)
+    times = []
+    for offset in [0, 100, 50, 300]:  # one window arrives late, overlapping others
+        t = offset + rng.uniform(0, 100, 40)
+        v = rng.uniform(0, 1, (40, 2))
+        archive.append("pump", SensorWindow(v, ["a", "b"], t))
+        times.append(t)
+    archive.append("pump", SensorWindow([[0.5, 5.0]], ["a", "b"], [1000.0]))
+    times = np.append(np.concatenate(times), 1000.0)
+
+    for start, end in [(None, None), (20, 70), (120, 130), (390, None), (1000, 2000)]:
+        window = archive.read("pump", start, end)
+        keep = ((start is None) | (times >= (start or 0))) & ((end is None) | (times < (end or 0)))
+        assert sorted(window.timestamps.tolist()) == sorted(times[keep].tolist())
+        assert len(archive.blocks("pump", start, end)) <= len(archive.blocks("pump"))
+
+    low, high = np.array([0.0, 0.0]), np.array([1.0, 1.0])
+    result = archive.violations("pump", low, high)
+    assert result["counts"] == {"a": 0, "b": 1}
+    assert result["samples"] == [{"timestamp": 1000.0, "sensor": "b", "value": 5.0}]
+    assert result["blocks_scanned"] == 1 and result["blocks_skipped"] == len(archive.blocks("pump")) - 1
+    result = archive.violations("pump", low, high, 0, 1000)
+    assert result["counts"]["b"] == 0 and result["blocks_scanned"] == 0
+
+    # Archives written before the index existed get it rebuilt on first use
+    (tmp_path / "pump".encode().hex() / "index.f8").unlink()
+    assert len(archive.read("pump", 20, 70)) == int(((times >= 20) & (times < 70)).sum())
+
+    # Single-sample appends fill the last block instead of adding a record each
+    for t in range(100):
+        archive.append("fan", SensorWindow([[t % 7, 1.0]], ["a", "b"], [float(t)]))
+    blocks = archive.blocks("fan")
+    assert blocks[:, 0].tolist() == list(range(0, 100, 16)) and blocks[:, 4].all()
+    assert blocks[-1, 3] == 99 and blocks[0, 5] == 0 and blocks[0, 7] == 6
+    assert archive.read("fan", 30.5, 40).timestamps.tolist() == list(range(31, 40))
+    # The index header records whether blocks follow each other in time
+    assert archive._load_index(archive.path("fan"), 100)[1]
+    archive.append("fan", SensorWindow([[0.0, 1.0]], ["a", "b"], [50.0]))
+    assert not archive.blocks("fan")[-1, 4] and archive.read("fan", 50, 51).timestamps.tolist() == [50, 50]
+    assert not archive._load_index(archive.path("fan"), 101)[1]
+    assert archive.read("fan", 95, 97).timestamps.tolist() == [95, 96]
+
+    # A read keeps to the sample count it started with while another append lands
+    stale = archive.samples("fan")
+    archive.append("fan", SensorWindow(np.ones((40, 2)), ["a", "b"], np.arange(200.0, 240.0)))
+    real_samples = archive.samples
+    for query in [lambda: len(archive.read("fan")), lambda: archive.violations("fan", low, high)["counts"]["a"]]:
+        counts = iter([stale])
+        monkeypatch.setattr(archive, "samples", lambda asset_id: next(counts, None) or real_samples(asset_id))
+        assert query() in (101, 70)
+    monkeypatch.delattr(archive, "samples")
+    assert len(archive.read("fan")) == 141
+
+    # An index written for another sensor list is rebuilt, not misread
+    swapped = SampleArchive(str(tmp_path), ["b", "a"])
+    assert swapped.violations("fan", np.array([0.0, 0.0]), np.array([10.0, 1.0]))["counts"] == {"b": 0, "a": 70}
+    assert archive.violations("fan", low, high)["counts"] == {"a": 70, "b": 0}
+
+@pytest.mark.parametrize("window", [1, 2, 5, 64])
+def test_rolling_sensor_matches_full_recompute(window):
+    rng = np.random.default_rng(window)
+    values = np.round(rng.normal(50, 5, size=300), 1)
+    values[rng.random(values.size) < 0.03] += 500
+    values[rng.random(values.size) < 0.05] = np.nan
+    sensor = RollingSensor(window)
+    kept = []
+    for value in values.tolist():
+        sensor.push(value)
+        if value == value:
+            kept = (kept + [value])[-window:]
+        assert sensor.robust_mean() == pytest.approx(robust_means(np.array(kept))[0], rel=1e-9, nan_ok=True)
+
+def test_rolling_sensor_blocks_match_full_recompute(monkeypatch):
+    from app import streaming
+    monkeypatch.setattr(streaming, "_LOAD", 2)  # many small blocks, split and emptied often
+    rng = np.random.default_rng(11)
+    values = np.round(rng.normal(50, 5, size=600), 1)
+    values[rng.random(values.size) < 0.03] += 500
+    values[::150] = 1e17  # passes through the window without leaving a residue
+    sensor = RollingSensor(40)
+    for i, value in enumerate(values.tolist()):
+        sensor.push(value)
+        kept = values[max(0, i - 39):i + 1]
+        assert sensor.robust_mean() == pytest.approx(robust_means(kept)[0], rel=1e-9)
+    assert len(sensor.blocks) > 5 and sum(map(len, sensor.blocks)) == 40
+
+def test_rolling_sensor_does_not_drift_or_keep_non_finite_values():
+    sensor = RollingSensor(4)
+    for value in [1e17, -1e17, float("inf"), 3e16, float("-inf"), 1.0, 2.0, 3.0, 4.0, float("nan")]:
+        sensor.push(value)
+    assert len(sensor) == 4 and sensor.robust_mean() == 2.5
+
+def test_sensor_schema_groups_are_contiguous():
+    from app.health_utils import SensorSchema, QUAD_SCHEMA, DUO_SCHEMA, field_alias_duo
+    schema = SensorSchema([("a", "A", "x"), ("b", "B", "y"), ("c", "C", "x")])
+    assert schema.keys == ("a", "c", "b")
+    assert schema.group_names == ("x", "y")
+    assert schema.group_health(np.array([True, False, True])) == {"x": False, "y": True}
+    assert QUAD_SCHEMA.group_names == ("temperature", "vibration", "magnetic_flux", "ultrasound")
+    assert DUO_SCHEMA.alias == field_alias_duo
+    assert DUO_SCHEMA.low_keys[0] == "temperature_skin_healthy"
+
+def test_registry_evicts_least_recently_used_profile():
+    from app.profiles import ProfileRegistry
+    registry = ProfileRegistry(max_profiles=2)
+    first = registry.put({"temperature_skin_healthy": 1})
+    second = registry.put({"temperature_skin_healthy": 2})
+    assert registry.get(first.profile_id) is first
+    registry.put({"temperature_skin_healthy": 3})
+    assert registry.get(second.profile_id) is None
+    assert registry.get(first.profile_id) is first
+
+    from app.health_utils import QUAD_SCHEMA
+    low, high = first.bands(QUAD_SCHEMA)
+    assert first.bands(QUAD_SCHEMA)[0] is low
+    assert low[0] == 1 and np.isneginf(low[1:]).all() and np.isposinf(high).all()
+
+def test_offloaded_robust_means_match_inline():
+    from app.health_utils import configure_offload, _robust_means
+    rng = np.random.default_rng(7)
+    matrix = np.asfortranarray(rng.normal(5, 1, size=(5000, len(field_alias))))
+    matrix[rng.random(matrix.shape) < 0.01] = np.nan
+    configure_offload(min_samples=1000, workers=2)
+    try:
+        offloaded = robust_means(matrix)
+        small = robust_means(matrix[:10])
+    finally:
+        configure_offload(0)
+    np.testing.assert_allclose(offloaded, _robust_means(matrix, 3.5, 0.05), rtol=1e-12)
+    np.testing.assert_allclose(small, _robust_means(np.asfortranarray(matrix[:10]), 3.5, 0.05), rtol=1e-12)
+
+
+def test_rollups_track_archive_appends(tmp_path):
+    from app.archive import SampleArchive
+    from app.health_utils import SensorWindow
+    from app.rollups import RollupStore, SKETCH_ACCURACY
+    rng = np.random.default_rng(9)
+    times = 1_699_920_000 + np.arange(7200.0)  # two hours at 1 Hz, from midnight UTC
+    values = np.column_stack([rng.normal(40, 2, times.size), rng.normal(-3, 0.5, times.size)])
+    values[rng.random(values.shape) < 0.01] *= 20
+    values[::97, 1] = np.nan
+    store = RollupStore(SampleArchive(str(tmp_path), ["a", "b"]), {"minute": 90, "hour": 24, "day": 7})
+    writer = SampleArchive(str(tmp_path), ["a", "b"])  # e.g. another worker sharing the archive
+    for part in np.array_split(np.arange(times.size), 5):
+        writer.append("pump", SensorWindow(values[part], ["a", "b"], times[part]))
+        store.refresh("pump")
+
+    start, end, rollup = store.summary("pump", "day")
+    assert end - start == 86400 and rollup.count.tolist() == np.sum(~np.isnan(values), axis=0).tolist()
+    assert np.allclose(rollup.total, np.nansum(values, axis=0))
+    assert np.allclose(rollup.robust_means(), robust_means(np.asfortranarray(values)), rtol=SKETCH_ACCURACY)
+    stats = rollup.stats(["a", "b"])
+    for i, key in enumerate(["a", "b"]):
+        column = values[:, i][~np.isnan(values[:, i])]
+        assert stats[key]["min"] == column.min() and stats[key]["max"] == column.max()
+        assert abs(stats[key]["p50"] - np.median(column)) <= SKETCH_ACCURACY * abs(np.median(column)) * 1.01
+
+    # Only the newest minute buckets are retained; the hour buckets still cover everything
+    assert len(store.refresh("pump").buckets["minute"]) == 90
+    start, end, hours = store.summary("pump", "hour", times[0], times[-1] + 1)
+    assert hours.count.tolist() == rollup.count.tolist()
+    assert store.summary("pump", "hour", 0, 1)[0] is None
+    assert store.summary("other", "hour") is None
+
+    # Another worker drops the asset and re-creates it with a longer history
+    assert writer.drop("pump")
+    writer.append("pump", SensorWindow(np.ones((8000, 2)), ["a", "b"], times[0] + np.arange(8000.0)))
+    start, end, rollup = store.summary("pump", "day")
+    assert rollup.count.tolist() == [8000, 8000] and rollup.stats(["a", "b"])["a"]["max"] == 1.0
+
+def test_rollups_fold_in_blocks_and_skip_expired_ones(tmp_path, monkeypatch):
+    from app import archive as archive_module
+    from app.archive import SampleArchive
+    from app.health_utils import SensorWindow
+    from app.rollups import RollupStore
+    monkeypatch.setattr(archive_module, "BLOCK_ROWS", 16)
+    archive = SampleArchive(str(tmp_path), ["a"])
+    times = 86400.0 * np.arange(40) + 30  # one sample a day
+    archive.append("pump", SensorWindow(np.arange(40.0)[:, None], ["a"], times))
+    archive.append("pump", SensorWindow([[-1.0]], ["a"], [times[3] + 60]))  # late, for an expired day
+    reads = []
+    rows = archive.rows
+    monkeypatch.setattr(archive, "rows", lambda *args: reads.append(args[1:]) or rows(*args))
+    store = RollupStore(archive, {"minute": 5, "hour": 5, "day": 5})
+    state = store.refresh("pump")
+    assert reads == [(32, 41)] and state.covered == 41  # the late row fills the last block
+    assert sorted(state.buckets["day"]) == (86400 * np.arange(35, 40)).tolist()
+    assert store.summary("pump", "day", 0, None)[2].count.tolist() == [5]
+
+
+def test_rollup_means_below_sketch_resolution():
+    from app.rollups import Rollup, SKETCH_ACCURACY
+    # A MAD under the bin width reads as 0, like an exact MAD of 0 on quantized readings
+    values = np.array([[44.0]] * 20 + [[44.2]] * 5 + [[-221.0]] * 3)
+    assert robust_means(values)[0] == 44.0
+    assert Rollup.grouped(values, np.array([0]))[0].robust_means()[0] == pytest.approx(44.0, rel=SKETCH_ACCURACY)
+    # Readings spread inside the median's bin are off by at most its width
+    values = np.random.default_rng(3).uniform(100, 101.5, (500, 1))
+    mean = Rollup.grouped(values, np.array([0]))[0].robust_means()[0]
+    assert abs(mean - robust_means(values)[0]) <= 2 * SKETCH_ACCURACY * 101.5